@@ -0,0 +1,41 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: qap
+# @file: /conftest.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 9:12:27 pm
+# @description:
+#  The fixtures of the tests, each test runs in a scratch directory
+#  holding the instances it asks for, since the paths in `qap.conf`
+#  are relative to the working directory.
+
+import os
+import tarfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+  """a scratch working directory with `qapsoln`, the instances
+    are added by `add_instances`
+  """
+  os.symlink(f'{HERE}/qapsoln', tmp_path / 'qapsoln')
+  (tmp_path / 'qapdata').mkdir()
+  monkeypatch.chdir(tmp_path)
+  return tmp_path
+
+
+@pytest.fixture
+def add_instances(workdir):
+  """extract the named QAPLIB instances from `qapdata.tar.gz`"""
+
+  def _add(*names):
+    with tarfile.open(f'{HERE}/qapdata.tar.gz') as tar:
+      for name in names:
+        tar.extract(f'{name}.dat', workdir / 'qapdata')
+
+  return _add
@@ -0,0 +1,193 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: qap
+# @file: /benchmark.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 7:52:40 pm
+# @description:
+#  The scaling benchmark on synthetic instances, see `synthetic.py`,
+#  - the hot kernels timed separately over a ladder of sizes,
+#  - the end-to-end solves up to `--max_size_solve`,
+#  the results are dumped as json and compared against a baseline,
+#  a run slower than `tolerance` times the baseline is a regression.
+#
+#  python -m qap.benchmark --sizes 50 100 200 --out bench.json
+#  python -m qap.benchmark --baseline bench.json --tolerance 1.5
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from .models import *
+from .synthetic import *
+
+logger = logging.getLogger('qap.benchmark')
+
+SOLVERS = {
+    'gradient_proj':
+        lambda param, **kw: l2_exact_penalty_gradient_proj(
+            param, gd_method='np_pd_on_dc', st_method='np_st', **kw),
+    'glp':
+        l2_exact_penalty_glp,
+    'frank_wolfe':
+        frank_wolfe,
+    'mirror_descent':
+        sinkhorn_mirror_descent,
+    'tabu':
+        robust_tabu_search,
+}
+
+
+def timeit(f, repeat=3):
+  """the wall-clock seconds of `repeat` calls"""
+  seconds = []
+  out = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    out = f()
+    seconds.append(time.perf_counter() - start)
+  return seconds, out
+
+
+def bench_kernels(param, repeat=3, seed=1):
+  """the hot kernels at a random interior point and direction"""
+  n = param.n
+  rs = np.random.RandomState(seed)
+  nabla = QAPDerivativeL2Penalty(param, 0.1)
+  x = rs.exponential(1, size=(n, n))
+  for _ in range(100):
+    x /= x.sum(1, keepdims=True)
+    x /= x.sum(0, keepdims=True)
+  d0 = nabla.partial_f(x)
+  # a tenth of the entries at their lower bounds
+  lb = np.where(rs.random_sample((n, n)) < 0.1)
+  dp = np_pd_on_dc(param, d0, lb)[0]
+  stp = np_st(dp, x, param)
+  p = rs.permutation(n)
+  xp = perm_matrix(p)
+
+  kernels = {
+      'partial_f': lambda: nabla.partial_f(x),
+      'obj': lambda: nabla.obj(x),
+      'projection': lambda: np_pd_on_dc(param, d0, lb),
+      'projection_free': lambda: np_pd_on_dc(param, d0, ([], [])),
+      'proj_birkhoff': lambda: proj_birkhoff(x - d0),
+      'stepsize': lambda: np_st(dp, x, param),
+      'line_search': lambda: exact_line_search(nabla, x, dp, d0, stp),
+      'rounding': lambda: extract_sol_rounding(
+          x, param.A0, param.B0, max_iterations=100),
+      'check_obj_val_perm': lambda: check_obj_val(param, xp),
+      'check_obj_val_dense': lambda: check_obj_val(param, x),
+  }
+  for name, f in kernels.items():
+    seconds, _ = timeit(f, repeat)
+    yield name, seconds, None
+
+
+def bench_solvers(param, solvers, repeat=1, **kwargs):
+  for name in solvers:
+    seconds, x = timeit(lambda: SOLVERS[name](param, **kwargs), repeat)
+    x = perm_matrix(to_perm(x)) if not is_perm_matrix(x) else x
+    yield name, seconds, float(check_obj_val(param, x))
+
+
+def run(kinds, sizes, **kwargs):
+  """the records of the size ladder"""
+  records = []
+  for kind in kinds:
+    for n in sizes:
+      start = time.perf_counter()
+      param = make_param(kind, n, seed=kwargs.get('seed', 1))
+      setup = time.perf_counter() - start
+      logger.info(f"{kind}{n}: generated in {setup:.2f}s, "
+                  f"sparse: {param.sparse}")
+      runs = [('kernel', *r) for r in bench_kernels(
+          param, kwargs.get('repeat', 3), kwargs.get('seed', 1))]
+      if n <= kwargs.get('max_size_solve', 200):
+        runs += [('solve', *r) for r in bench_solvers(
+            param,
+            kwargs.get('solvers', list(SOLVERS)),
+            max_iteration=kwargs.get('max_iteration', 100),
+            tabu_time=kwargs.get('tabu_time', 1),
+            logging_interval=10**9)]
+      for group, target, seconds, value in runs:
+        rec = {
+            'kind': kind,
+            'n': n,
+            'group': group,
+            'target': target,
+            'seconds_min': min(seconds),
+            'seconds_median': statistics.median(seconds),
+            'value': value
+        }
+        logger.info(json.dumps(rec))
+        records.append(rec)
+  return records
+
+
+def key(rec):
+  return rec['kind'], rec['n'], rec['group'], rec['target']
+
+
+def regressions(records, baseline, tolerance=1.5, min_seconds=1e-3):
+  """the records slower than `tolerance` times their baseline,
+    timings under `min_seconds` are noise and skipped
+  """
+  base = {key(rec): rec for rec in baseline}
+  slow = []
+  for rec in records:
+    ref = base.get(key(rec))
+    if ref is None:
+      continue
+    if max(rec['seconds_min'], ref['seconds_min']) < min_seconds:
+      continue
+    ratio = rec['seconds_min'] / max(ref['seconds_min'], 1e-12)
+    if ratio > tolerance:
+      slow.append({**rec, 'baseline': ref['seconds_min'], 'ratio': ratio})
+  return slow
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--kinds',
+      nargs='+',
+      default=['tai', 'grid', 'esc'],
+      choices=list(GENERATORS))
+  parser.add_argument(
+      '--sizes', type=int, nargs='+', default=[50, 100, 200, 500, 1000])
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument(
+      '--solvers', nargs='+', default=list(SOLVERS), choices=list(SOLVERS))
+  parser.add_argument('--max_size_solve', type=int, default=200)
+  parser.add_argument('--max_iteration', type=int, default=100)
+  parser.add_argument('--tabu_time', type=float, default=1)
+  parser.add_argument('--out', default='benchmark.json')
+  parser.add_argument('--baseline', default=None)
+  parser.add_argument('--tolerance', type=float, default=1.5)
+  parser.add_argument('--min_seconds', type=float, default=1e-3)
+  args = vars(parser.parse_args())
+  configure_logging(None)
+  # keep the logging of the solvers out of the timings
+  logging.getLogger('qap.run').setLevel(logging.WARNING)
+
+  records = run(**args)
+  slow = []
+  if args['baseline']:
+    with open(args['baseline'], 'r') as f:
+      baseline = json.load(f)['records']
+    slow = regressions(records, baseline, args['tolerance'],
+                       args['min_seconds'])
+  with open(args['out'], 'w') as f:
+    json.dump({'args': args, 'records': records, 'regressions': slow},
+              f,
+              indent=2)
+  for rec in slow:
+    logger.error(f"regression: {rec}")
+  sys.exit(1 if slow else 0)
@@ -11,4 +11,6 @@ QAP_INSTANCE = 'qapdata'
 QAP_SOL = 'qapsoln'
 QAP_DEFAULT = {'scaling': 'L1', 'mu': 1}
 MSK_DEFAULT = {'mioMaxTime': 60}
-RESULT_DIR = 'result'
\ No newline at end of file
+RESULT_DIR = 'result'
+RESULT_DB = 'results.sqlite'
+QAP_CACHE = '.cache'
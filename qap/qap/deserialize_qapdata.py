@@ -7,37 +7,77 @@
 #    Wednesday, 9th September 2020 2:06:20 pm
 # @description:
 
+import hashlib
+import os
+
 import numpy as np
-import re
+
+from .conf import *
 
 
-def parse(path):
+def tokenize(path):
+  """all numbers of a QAPLIB file, separated by
+    white spaces or commas, decimals and negatives included
+  """
   try:
-    f = open(path, 'r')
-  except:
+    with open(path, 'r') as f:
+      text = f.read()
+  except OSError:
     raise ValueError("cannot open data file")
+  return np.array(text.replace(',', ' ').split(), dtype=np.float64)
 
-  dim = int(f.readline().split('\n')[0])
 
-  data = (float(a) for line in f for a in re.findall('\d+', line))
+def cache_path(path, suffix=''):
+  """the cache file of `path`, keyed by
+    its absolute path, size and mtime
+  """
+  st = os.stat(path)
+  key = hashlib.sha1(
+      f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+  name = os.path.basename(path).split('.')[0]
+  return f"{QAP_CACHE}/{name}.{key.hexdigest()[:16]}{suffix}.npy"
 
-  arr = np.fromiter(data, dtype=np.float).reshape((2, dim, dim))
+
+def load_cache(path, suffix=''):
+  """memory-mapped cached array, None if missing"""
+  try:
+    return np.load(cache_path(path, suffix), mmap_mode='r')
+  except (OSError, ValueError):
+    return None
+
+
+def save_cache(path, arr, suffix=''):
+  os.makedirs(QAP_CACHE, exist_ok=True)
+  f_cache = cache_path(path, suffix)
+  # np.save appends .npy to names without it
+  f_tmp = f"{f_cache[:-4]}.{os.getpid()}.tmp.npy"
+  np.save(f_tmp, arr)
+  os.replace(f_tmp, f_cache)
+
+
+def parse(path, cache=True):
+  arr = load_cache(path) if cache else None
+  if arr is None:
+    data = tokenize(path)
+    dim = int(data[0])
+    if data.size != 1 + 2 * dim * dim:
+      raise ValueError(f"expect {2 * dim * dim} entries for n={dim}, "
+                       f"found {data.size - 1}")
+    arr = data[1:].reshape((2, dim, dim))
+    if cache:
+      save_cache(path, arr)
 
   A, B = arr
   return A, B
 
 
 def parse_sol(path):
-  try:
-    f = open(path, 'r')
-  except:
-    raise ValueError("cannot open data file")
-
-  n, obj = map(int, f.readline().strip().split())
+  data = tokenize(path)
 
-  data = (int(a) for line in f for a in re.findall('\d+', line))
+  n, obj = int(data[0]), data[1]
+  obj = int(obj) if obj.is_integer() else obj
 
-  arr = np.fromiter(data, dtype=np.int)
+  arr = data[2:].astype(int)
 
   return n, obj, arr
 
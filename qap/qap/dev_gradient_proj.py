@@ -11,6 +11,7 @@ from .models import *
 from .conf import *
 
 if __name__ == "__main__":
+  configure_logging()
 
   instance_name = 'bur26a'
   # instance_name = 'bur26a'
@@ -52,7 +53,8 @@ if __name__ == "__main__":
   for i in range(max_iter):
 
     _obj = nabla.obj(x)
-    _logging = i % logging_interval == 0
+    # the diagnostics are computed only if they are logged
+    _logging = i % logging_interval == 0 and logger.isEnabledFor(logging.INFO)
     d0 = nabla.partial_f(x)
 
     # indices of active lower bound constraints
@@ -116,7 +118,7 @@ if __name__ == "__main__":
       logger.info(f"steps: {i_s}, {vs}, {stp}")
       # update solution
       logger.info(f"obj: {vs}, {vs - _obj}, gap: {(vs - best_obj)/best_obj}")
-      logger.info(f"trace deficiency: {n - x.dot(x.T).trace()}")
+      logger.info(f"trace deficiency: {n - (x * x).sum()}")
 
   print(None)
   print(1)
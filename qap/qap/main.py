@@ -8,26 +8,18 @@
 # @description:
 
 import argparse
+import functools
 import json
+import multiprocessing as mp
+import os
 import sys
-import pickle as pk
+import time
+import traceback
 
 from .models import *
 from .conf import *
-
-
-def write_sol(instance_name, test_name, x_sol):
-  x = x_sol.round(3)
-  with open(f"{RESULT_DIR}/{instance_name}_{test_name}.pk", 'wb') as f:
-    pk.dump(x, f)
-
-  with open(f"{RESULT_DIR}/{instance_name}_{test_name}", 'w') as f1:
-    y = (x > 0).nonzero()
-    list_sol = list(zip(*y))
-    for i, j in list_sol:
-      f1.write(f"{i}, {j}\n")
-
-  return 1
+from .result_store import *
+from .shared_store import *
 
 
 def main_single(instance_name, **kwargs):
@@ -36,71 +28,245 @@ def main_single(instance_name, **kwargs):
   msk_params = {**MSK_DEFAULT, **kwargs}
   qap_params = {**QAP_DEFAULT, **kwargs}
 
-  # coefficients
-  A0, B0 = parse(f'{QAP_INSTANCE}/{instance_name}.dat')
-
-  # parse known solution
-  _, best_obj, arr = parse_sol(f'{QAP_SOL}/{instance_name}.sln')
-
-  param = QAPParam(A0, B0, best_obj, arr, **qap_params)
+  # coefficients and known solution, attached if shared by the sweep,
+  #  a configuration of other scaling or sparsity loads its own
+  shared = kwargs.get('shared')
+  if shared and compatible(shared, qap_params):
+    param = attach(shared)
+    param = param.astype(qap_params.get('precision', param.dtype))
+  else:
+    if shared:
+      logging.info(f"{instance_name} not shared, instance options differ")
+    param = load_param(instance_name, **qap_params)
+  best_obj = param.best_obj
 
   logging.info(f"problem @{instance_name} parsing finished")
   # running tests
   tests = [
       QAPTest('l2_exact_penalty_gradient_proj', l2_exact_penalty_gradient_proj,
               *(param,), **qap_params),
+      QAPTest('l2_exact_penalty_glp', l2_exact_penalty_glp, *(param,),
+              **qap_params),
+      QAPTest('l2_exact_penalty_gradient_proj_multistart',
+              l2_exact_penalty_gradient_proj_multistart, *(param,),
+              **qap_params),
+      QAPTest('robust_tabu', robust_tabu_search, *(param,), **qap_params),
+      QAPTest('frank_wolfe', frank_wolfe, *(param,), **qap_params),
+      QAPTest('sinkhorn_mirror_descent', sinkhorn_mirror_descent, *(param,),
+              **qap_params),
       # QAPTest('l2_conic_exact', l2_conic_georound, *(param, False), **msk_params),
       # QAPTest('l2_conic_georound', l2_conic_georound, *(param, True),**msk_params),
       # QAPTest('l2_naive_exact', l2_naive, *(10, param, True), **msk_params),
       # QAPTest('l2_naive_georound', l2_naive, *(10, param, False), **msk_params),
+      # QAPTest('l2_naive_structured', l2_naive_structured, *(10, param, True), **msk_params),
   ]
+  selected = kwargs.get('tests')
+  if selected:
+    tests = [t for t in tests if t.name in selected]
+  if kwargs.get('local_search'):
+    for t in tests:
+      t.attach(functools.partial(local_search_improve, param, **kwargs))
 
+  bounds = qap_bounds(param)
+  lb = bounds['value']
   objectives = {
       'best': {
           'instance': instance_name,
           'value': best_obj,
-          'rel_gap': 0,
+          'rel_gap': 0 if best_obj is not None else None,
           'trace_res': 0
+      },
+      'bounds': {
+          'instance': instance_name,
+          **bounds
       }
   }
+  solutions = {}
+  h = params_hash(run_params(kwargs))
   for t in tests:
+    if kwargs.get('trace'):
+      t.kwargs['tracer'] = PhaseTracer(qap_params.get('max_iteration') or 1000)
+    if kwargs.get('checkpoint_interval'):
+      t.kwargs['checkpoint'] = \
+        f"{RESULT_DIR}/{instance_name}_{t.name}_{h}.ckpt.npz"
     x_sol = t.run()
-    write_sol(instance_name, t.name, x_sol)
+    solutions[t.name] = x_sol
     obj = check_obj_val(param, x_sol)
     objectives[t.name] = {
         'instance': instance_name,
         'value': obj,
-        'rel_gap': (obj - best_obj) / best_obj,
+        'rel_gap': (obj - best_obj) / best_obj if best_obj else None,
+        # the certified gap against the lower bound
+        'lb_gap': (obj - lb) / obj if obj else 0,
         'trace_res': param.n - x_sol.dot(x_sol.T).trace(),
         'runtime': t.end - t.start
     }
+    tracer = t.kwargs.get('tracer')
+    if tracer is not None and tracer.size:
+      tracer.dump(f"{RESULT_DIR}/{instance_name}_{t.name}_{h}.trace")
+      objectives[t.name]['phases'] = tracer.totals()
 
-  import json
   format_obj_str = json.dumps(objectives, indent=2)
   logging.info(f"=== objectives: ===\n{format_obj_str}")
-  # dump the solution quality file
-  json.dump(objectives, open(f"{RESULT_DIR}/{instance_name}.json", 'w'))
+  # one transaction per instance, a killed run leaves no partial result
+  with ResultStore(f"{RESULT_DIR}/{RESULT_DB}") as store:
+    store.append(instance_name, run_params(kwargs), objectives, solutions)
 
   return objectives
 
 
+# the thread counts of the BLAS libraries, see `_limit_threads`
+BLAS_THREADS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# keys of the runner itself, not part of the experiment
+RUNNER_KEYS = {
+    'instance', 'workers', 'timeout', 'force', 'resume', 'checkpoint_interval',
+    'shared', 'sweep', 'logging_interval', 'trace'
+}
+
+
+def run_params(kwargs):
+  return {k: v for k, v in kwargs.items() if k not in RUNNER_KEYS}
+
+
+def is_finished(instance_name, **kwargs):
+  """the result exists and was produced by the same parameters"""
+  with ResultStore(f"{RESULT_DIR}/{RESULT_DB}") as store:
+    return store.is_finished(instance_name, run_params(kwargs))
+
+
+def _write_failure(instance_name, msg):
+  with open(f"{RESULT_DIR}/{instance_name}.err", 'w') as f:
+    f.write(msg)
+
+
+def _limit_threads(workers):
+  """share the cores among the workers, a BLAS starts as many
+    threads as there are cores in each process otherwise
+  """
+  threads = max(1, (os.cpu_count() or 1) // (workers or os.cpu_count() or 1))
+  for k in BLAS_THREADS:
+    os.environ[k] = str(threads)
+  # numpy has loaded its BLAS before the fork, the variables
+  #  are read only at load
+  try:
+    from threadpoolctl import threadpool_limits
+  except ImportError:
+    return
+  threadpool_limits(threads)
+
+
+def _run_instance(instance_name, kwargs, job=None):
+  _limit_threads(kwargs.get('workers'))
+  configure_logging()
+  job = job or instance_name
+  if os.path.exists(f"{RESULT_DIR}/{job}.err"):
+    os.remove(f"{RESULT_DIR}/{job}.err")
+  try:
+    main_single(instance_name, **kwargs)
+  except Exception:
+    _write_failure(job, traceback.format_exc())
+    sys.exit(1)
+  finally:
+    # the worker exits by os._exit, the tail of the log is
+    #  lost unless the listener is stopped here
+    stop_logging()
+
+
+def main_parallel(instances, **kwargs):
+  """solve the instances by a pool of processes,
+    largest first for load balancing, each killed after
+    `timeout` seconds of wall-clock.
+
+  Returns:
+      dict: failed instances and their tracebacks
+  """
+  queue = sorted(
+      instances,
+      key=lambda ins: os.path.getsize(f'{QAP_INSTANCE}/{ins}.dat'),
+      reverse=True)
+  return _run_pool([(ins, ins, kwargs) for ins in queue], **kwargs)
+
+
+def main_sweep(instance_name, configs, **kwargs):
+  """solve one instance under each of the `configs`, i.e., the
+    overrides of `kwargs`, by a pool of processes; the instance is
+    loaded once into shared memory and attached by the workers.
+
+  Returns:
+      dict: failed configurations and their tracebacks
+  """
+  qap_params = {**QAP_DEFAULT, **kwargs}
+  with SharedInstance.from_instance(instance_name, **qap_params) as shared:
+    logging.info(f"{instance_name} shared, {shared.nbytes / 2**20:.1f} MiB")
+    jobs = [(f"{instance_name}.{k}", instance_name, {
+        **kwargs,
+        **config, 'shared': shared.meta
+    }) for k, config in enumerate(configs)]
+    return _run_pool(jobs, **kwargs)
+
+
+def _run_pool(jobs, **kwargs):
+  """run the jobs (name, instance, kwargs) by a pool of processes"""
+  workers = kwargs.get('workers') or os.cpu_count()
+  timeout = kwargs.get('timeout')
+  queue = list(jobs)
+  running = {}
+  failed = {}
+  while queue or running:
+    while queue and len(running) < workers:
+      job, instance_name, job_kwargs = queue.pop(0)
+      proc = mp.Process(
+          target=_run_instance,
+          args=(instance_name, job_kwargs, job),
+          name=job)
+      proc.start()
+      running[job] = (proc, time.time())
+    time.sleep(0.1)
+    for ins, (proc, start) in list(running.items()):
+      if proc.is_alive():
+        if timeout and time.time() - start > timeout:
+          proc.terminate()
+          proc.join()
+          msg = f"timeout after {timeout}s"
+          _write_failure(ins, msg)
+          failed[ins] = msg
+          running.pop(ins)
+        continue
+      proc.join()
+      running.pop(ins)
+      if proc.exitcode != 0:
+        try:
+          with open(f"{RESULT_DIR}/{ins}.err", 'r') as f:
+            failed[ins] = f.read()
+        except OSError:
+          failed[ins] = f"exit code {proc.exitcode}"
+      logging.info(f"finished @{ins}, {len(queue)} left")
+  return failed
+
+
 def main(**kwargs):
   instance = kwargs.get('instance')
-  failed = []
+  os.makedirs(RESULT_DIR, exist_ok=True)
+  if instance and kwargs.get('sweep'):
+    with open(kwargs['sweep'], 'r') as f:
+      configs = json.load(f)
+    failed = main_sweep(instance, configs, **kwargs)
+    logging.error(f"failed configurations: \n{list(failed)}")
+    return
   if instance:
     main_single(instance, **kwargs)
-  else:
-    files = os.listdir(QAP_INSTANCE)
-    for f in files:
-      try:
-        ins, suffix = f.split('.')
-        objectives = main_single(ins, **kwargs)
-        with open(f"{RESULT_DIR}/{ins}.json", 'w') as f_out:
-          json.dump(objectives, fp=f_out)
-      except Exception as e:
-        logging.error(f"failed @{ins}")
-        failed.append(ins)
-  logging.error(f"failed instances: \n{failed}")
+    return
+  instances = [
+      f.split('.')[0] for f in os.listdir(QAP_INSTANCE) if f.endswith('.dat')
+  ]
+  if not kwargs.get('force'):
+    instances = [ins for ins in instances if not is_finished(ins, **kwargs)]
+  logging.info(f"{len(instances)} instances to solve")
+  failed = main_parallel(instances, **kwargs)
+  with open(f"{RESULT_DIR}/failed.json", 'w') as f:
+    json.dump(failed, f, indent=2)
+  logging.error(f"failed instances: \n{list(failed)}")
 
 
 if __name__ == "__main__":
@@ -108,5 +274,94 @@ if __name__ == "__main__":
   parser.add_argument('--instance', default=None)
   parser.add_argument('--logging_interval', type=int, default=50)
   parser.add_argument('--max_iteration', type=int, default=1000)
+  parser.add_argument(
+      '--gd_method',
+      default='msk_pd_on_dc_lp',
+      choices=[
+          'msk_pd_on_dc', 'msk_pd_on_dc_lp', 'np_pd_on_dc', 'msk_persistent',
+          'msk_persistent_lp'
+      ])
+  parser.add_argument(
+      '--st_method', default='msk_st', choices=['msk_st', 'np_st'])
+  parser.add_argument(
+      '--st_line_search', default='grid', choices=['grid', 'exact'])
+  parser.add_argument(
+      '--as_release',
+      default='batch',
+      choices=['batch', 'single'],
+      help='bounds released per active set tuning round')
+  parser.add_argument(
+      '--tests',
+      nargs='+',
+      default=['l2_exact_penalty_gradient_proj'],
+      help='names of the QAPTests to run')
+  parser.add_argument('--n_starts', type=int, default=8)
+  parser.add_argument(
+      '--local_search',
+      default=None,
+      choices=['first', 'best'],
+      help='improve the solutions by pairwise-swap local search')
+  parser.add_argument(
+      '--fw_variant', default='away', choices=['vanilla', 'away', 'pairwise'])
+  parser.add_argument(
+      '--fw_mu',
+      type=float,
+      default=0,
+      help='penalty of Frank-Wolfe, 0 for the relaxation')
+  parser.add_argument(
+      '--md_etas',
+      type=float,
+      nargs='+',
+      default=None,
+      help='stepsizes of the batched mirror descent')
+  parser.add_argument(
+      '--md_mus',
+      type=float,
+      nargs='+',
+      default=None,
+      help='penalties of the batched mirror descent')
+  parser.add_argument(
+      '--tabu_time', type=float, default=10, help='seconds of tabu search')
+  parser.add_argument('--tabu_iterations', type=int, default=None)
+  parser.add_argument(
+      '--precision',
+      default='float64',
+      choices=['float64', 'float32'],
+      help='precision of the relaxations, the objectives are in float64')
+  parser.add_argument(
+      '--refine_iteration',
+      type=int,
+      default=50,
+      help='last iterations in float64 if the precision is lower')
+  parser.add_argument(
+      '--trace',
+      action='store_true',
+      help='dump the per-iteration phase timings of the methods')
+  parser.add_argument(
+      '--workers',
+      type=int,
+      default=None,
+      help='size of the process pool, Defaults to the number of cores')
+  parser.add_argument(
+      '--timeout', type=float, default=None, help='wall-clock per instance')
+  parser.add_argument(
+      '--checkpoint_interval',
+      type=int,
+      default=50,
+      help='iterations between the checkpoints, 0 to disable')
+  parser.add_argument(
+      '--resume',
+      action='store_true',
+      help='resume the methods from their latest checkpoints')
+  parser.add_argument(
+      '--sweep',
+      default=None,
+      help='json list of the configurations to run on --instance, '
+      'which is shared by the workers')
+  parser.add_argument(
+      '--force',
+      action='store_true',
+      help='resolve instances already in the results')
   kwargs = parser.parse_args()
+  configure_logging()
   main(**vars(kwargs))
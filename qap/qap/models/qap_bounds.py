@@ -0,0 +1,85 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_bounds.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 3:48:27 pm
+# @description:
+#  Lower bounds of f(p) = Σ_ij A_ij B_{p_i p_j} = tr(A'XBX'),
+#  - Gilmore-Lawler bound,
+#  - projected eigenvalue bound (Hadley, Rendl and Wolkowicz, 1992),
+#  on the original (unscaled) matrices.
+
+from .qap_utils import *
+
+logger = logging.getLogger('qap.run.bounds')
+
+
+def _lap_min(C):
+  from scipy.optimize import linear_sum_assignment
+  r, c = linear_sum_assignment(C)
+  return C[r, c].sum()
+
+
+def _off_diagonal(M):
+  n = M.shape[0]
+  return M[~np.eye(n, dtype=bool)].reshape(n, n - 1)
+
+
+def gilmore_lawler_bound(A, B):
+  """GLB, the cost of unit i at location k is
+      A_ii B_kk + min scalar product of the off diagonals of
+      A_i and B_k, i.e., sorted ascending against descending,
+    all n² of them by one matmul, then a linear assignment.
+  """
+  A, B = to_dense(A).astype(np.float64), to_dense(B).astype(np.float64)
+  A_sorted = np.sort(_off_diagonal(A), axis=1)
+  B_sorted = -np.sort(-_off_diagonal(B), axis=1)
+  L = np.outer(np.diag(A), np.diag(B)) + A_sorted @ B_sorted.T
+  return _lap_min(L)
+
+
+def eigenvalue_bound(A, B):
+  """the projected eigenvalue bound, with X = ee'/n + VYV',
+      f(X) = -s(A)s(B)/n² + (2/n)r_A'Xr_B + tr(ÂYB̂Y')
+    and the last term is no less than the min scalar product of
+    the eigenvalues of Â = V'AV and B̂ = V'BV.
+    One of A, B should be symmetric so the other may be symmetrized,
+    None otherwise.
+  """
+  A, B = to_dense(A).astype(np.float64), to_dense(B).astype(np.float64)
+  if np.array_equal(A, A.T):
+    B = (B + B.T) / 2
+  elif np.array_equal(B, B.T):
+    A = (A + A.T) / 2
+  else:
+    return None
+  n = A.shape[0]
+  e = np.ones(n)
+  Q, _ = np.linalg.qr(np.column_stack([e, np.eye(n)[:, :n - 1]]))
+  V = Q[:, 1:]
+  lam_a = np.linalg.eigvalsh(V.T @ A @ V)
+  lam_b = np.linalg.eigvalsh(V.T @ B @ V)
+  r_a, r_b = A.sum(1), B.sum(1)
+  return -r_a.sum() * r_b.sum() / n**2 \
+    + _lap_min(2 / n * np.outer(r_a, r_b)) + lam_a @ lam_b[::-1]
+
+
+def qap_bounds(param: QAPParam):
+  """the lower bounds of the instance
+
+  Returns:
+      dict: bounds and the runtime
+  """
+  start = time.time()
+  glb = gilmore_lawler_bound(param.A0, param.B0)
+  eig = eigenvalue_bound(param.A0, param.B0)
+  bounds = {
+      'gilmore_lawler': glb,
+      'eigenvalue': eig,
+      'value': max(b for b in (glb, eig) if b is not None),
+      'runtime': time.time() - start
+  }
+  logger.info(f"bounds: {bounds}")
+  return bounds
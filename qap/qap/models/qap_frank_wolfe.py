@@ -0,0 +1,155 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_frank_wolfe.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 4:21:47 pm
+# @description:
+#  Frank-Wolfe (conditional gradient) methods over the Birkhoff
+#  polytope, the linear minimization is an assignment problem
+#    min_X <∇F, X> = min_p Σ_i ∇F_{i, p_i},
+#  so each iterate is a convex combination of permutations,
+#  kept as a list of the active vertices and their weights.
+
+from .qap_utils import *
+from .qap_gradient_proj import *
+from .qap_stepsize import *
+
+logger = logging.getLogger('qap.run.frank_wolfe')
+
+FW_VARIANTS = ('vanilla', 'away', 'pairwise')
+
+
+def lap_oracle(g):
+  """the vertex p minimizing <g, X>, X_{i, p_i} = 1"""
+  from scipy.optimize import linear_sum_assignment
+  _, p = linear_sum_assignment(g)
+  return p
+
+
+def vertex_matrix(p, dtype=np.float64):
+  X = np.zeros((len(p), len(p)), dtype=dtype)
+  X[np.arange(len(p)), p] = 1
+  return X
+
+
+def run_frank_wolfe(V, w, param: QAPParam, nabla: QAPDerivative, **kwargs):
+  """Frank-Wolfe method from x = Σ w_k⋅V_k,
+    - vanilla: d = S - x, t ∈ [0, 1],
+    - away: the better one of d = S - x and the away step
+        d = x - V, t ∈ [0, w_V / (1 - w_V)],
+    - pairwise: d = S - V, t ∈ [0, w_V],
+    where S is the LAP vertex and V is the active vertex
+    maximizing <∇F, V>; t is given by the exact line search.
+
+  Args:
+      V: the starting vertices, (K, n) permutations
+      w: their weights, (K, )
+      param (QAPParam): QAP params
+      nabla (QAPDerivative): derivative of the objective
+      fw_variant (str): one of `FW_VARIANTS`, Defaults to 'away'.
+      fw_tol (float): tolerance of the Frank-Wolfe gap
+
+  Returns:
+      x, the active vertices (K, n) and their weights (K, )
+  """
+  max_iter = kwargs.get('max_iteration', 500)
+  logging_interval = kwargs.get('logging_interval', 1)
+  variant = kwargs.get('fw_variant', 'away')
+  tol = kwargs.get('fw_tol', 1e-6)
+  if variant not in FW_VARIANTS:
+    raise ValueError(f"unknown Frank-Wolfe variant: {variant}")
+
+  n = param.n
+  rows = np.arange(n)
+  V, w = list(V), list(w)
+  x = sum(wj * vertex_matrix(v) for v, wj in zip(V, w))
+  final_iter = 0
+  for i in range(max_iter):
+    final_iter = i
+    _obj = nabla.obj(x)
+    # the diagnostics are computed only if they are logged
+    _logging = i % logging_interval == 0 and logger.isEnabledFor(logging.INFO)
+    d0 = nabla.partial_f(x)
+
+    s = lap_oracle(d0)
+    gx = (d0 * x).sum()
+    gap = gx - d0[rows, s].sum()
+    if gap <= tol:
+      break
+
+    # the away vertex
+    gv = d0[rows, np.array(V)].sum(1)
+    k = int(gv.argmax())
+    away = variant == 'away' and len(V) > 1 and gv[k] - gx > gap
+    if away:
+      d = x - vertex_matrix(V[k])
+      stp = w[k] / (1 - w[k])
+    elif variant == 'pairwise':
+      d = vertex_matrix(s)
+      d[rows, V[k]] -= 1
+      stp = w[k]
+    else:
+      d = vertex_matrix(s) - x
+      stp = 1.0
+
+    t, vs = exact_line_search(nabla, x, d, d0, stp, _obj)
+    x = nabla.move(x, d, t)
+
+    # update the weights of active vertices
+    if away:
+      w = [wj * (1 + t) for wj in w]
+      w[k] -= t
+    else:
+      if variant != 'pairwise':
+        w = [wj * (1 - t) for wj in w]
+      else:
+        w[k] -= t
+      j = next((j for j, v in enumerate(V) if np.array_equal(v, s)), None)
+      if j is None:
+        V.append(s)
+        w.append(t)
+      else:
+        w[j] += t
+    V, w = map(list, zip(*((v, wj) for v, wj in zip(V, w) if wj > 1e-12)))
+
+    if _logging:
+      logger.info(f'=====iteration: {i}====')
+      logger.info(f"fw gap: {gap}, away: {away}, steps: {t}, {stp}")
+      logger.info(f"obj: {vs}, {vs - _obj}, active vertices: {len(V)}")
+
+  logger.info(f"finish algorithm iteration@{final_iter}")
+  return x, np.array(V), np.array(w)
+
+
+def frank_wolfe(param: QAPParam, **kwargs):
+  """Exact penalty + Trace relaxation
+      min_X f = tr(A'XBX') + μ⋅|tr(XX') − n|
+    solved by Frank-Wolfe method, see `run_frank_wolfe`.
+    The iterates are convex combinations of permutations,
+    the best active vertex w.r.t. the QAP objective is returned.
+    μ is `fw_mu`, not the `mu` of the other methods, since a
+    large penalty is concave toward every vertex and the first
+    step goes all the way to one; Defaults to 0, the relaxation.
+
+  Returns:
+      X_sol: the best permutation matrix
+  """
+  n = param.n
+
+  # hyper parameters
+  mu = kwargs.get('fw_mu', 0)
+
+  # 𝛁F
+  nabla = QAPDerivativeL2PenaltyCache(param, mu)
+
+  # the barycenter, i.e., the n cyclic shifts with equal weights
+  V0 = (np.arange(n)[None, :] + np.arange(n)[:, None]) % n
+  x, V, w = run_frank_wolfe(V0, np.ones(n) / n, param, nabla, **kwargs)
+
+  # the closest vertex to x is a candidate as well
+  V = np.vstack([V, to_perm(x)])
+  objs = perm_obj(param.A0, param.B0, V)
+  logger.info(f"best vertex: {objs.min()} of {len(V)}")
+  return perm_matrix(V[objs.argmin()])
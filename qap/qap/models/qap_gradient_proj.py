@@ -10,28 +10,47 @@
 #  The key is to compute projections
 
 from .qap_utils import *
+from .qap_projection import *
+from .qap_stepsize import *
+from .qap_trace import *
 
 logger = logging.getLogger('qap.run.gradient_projection')
 
 
 class QAPDerivativeL2Penalty(QAPDerivative):
+  """the derivative of the L2 exact penalty,
+    `mu` is a float or a (K, ) array for a (K, n, n) stack
+  """
 
   def __init__(self, param, mu, *args):
     super().__init__(param=param, *args)
     self.mu = mu
+    self._mu = np.asarray(mu, dtype=self.dtype)[..., None, None]
 
   def partial_f(self, X):
     df = super().partial_f(X)
-    return df - 2 * self.mu * X
+    return df - 2 * self._mu * X
 
   def obj(self, X):
     obj = super().obj(X)
-    return obj - self.mu * X.dot(X.T).trace() + self.mu * X.shape[0]
+    return obj - self.mu * (X * X).sum((-2, -1)) + self.mu * X.shape[-1]
+
+  def curvature(self, D):
+    return super().curvature(D) - self.mu * (D * D).sum((-2, -1))
 
   def original_obj(self, X):
     return super().obj(X)
 
 
+class QAPDerivativeL2PenaltyCache(QAPDerivativeCache, QAPDerivativeL2Penalty):
+
+  def __init__(self, param, mu, *args, refresh_interval=50):
+    QAPDerivativeL2Penalty.__init__(self, param, mu, *args)
+    self.refresh_interval = refresh_interval
+    self._moves = 0
+    self._memo = []
+
+
 def msk_pd_on_dc(
     param: QAPParam,
     dF,  # gradient: \nabla dF
@@ -52,7 +71,7 @@ def msk_pd_on_dc(
       solution, model, variable, and lb constraints
   """
 
-  A, B, n, m, e, E, ab = param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+  A, B, n, m = param.A, param.B, param.n, param.m
 
   model = mf.Model('projected_gradient_on_D_cone')
   D = model.variable("d", [*A.shape], dom.unbounded())
@@ -64,7 +83,8 @@ def msk_pd_on_dc(
   model.constraint(expr.vstack(v, m), dom.inQCone())
   constrs_a = model.constraint(expr.sum(D, 0), dom.equalsTo(0))
   constrs_b = model.constraint(expr.sum(D, 1), dom.equalsTo(0))
-  constrs_lb = model.constraint(D.pick(*lb_indices), dom.equalsTo(0))
+  lb_x, lb_y = (np.asarray(ix).tolist() for ix in lb_indices)
+  constrs_lb = model.constraint(D.pick(lb_x, lb_y), dom.equalsTo(0))
   # constrs_ub = model.constraint(D.pick(*ub_indices), dom.lessThan(0))
 
   # set params
@@ -97,7 +117,7 @@ def msk_pd_on_dc_lp(
             solution, model, variable, and lb constraints
     """
 
-  A, B, n, m, e, E, ab = param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+  A, B, n, m = param.A, param.B, param.n, param.m
 
   model = mf.Model('projected_gradient_on_D_cone')
   D = model.variable("d", [*A.shape], dom.inRange(-1, 1))
@@ -107,7 +127,8 @@ def msk_pd_on_dc_lp(
 
   constrs_a = model.constraint(expr.sum(D, 0), dom.equalsTo(0))
   constrs_b = model.constraint(expr.sum(D, 1), dom.equalsTo(0))
-  constrs_lb = model.constraint(D.pick(*lb_indices), dom.greaterThan(0))
+  lb_x, lb_y = (np.asarray(ix).tolist() for ix in lb_indices)
+  constrs_lb = model.constraint(D.pick(lb_x, lb_y), dom.greaterThan(0))
   # constrs_ub = model.constraint(D.pick(*ub_indices), dom.lessThan(0))
 
   # set params
@@ -119,6 +140,117 @@ def msk_pd_on_dc_lp(
   return D_sol, model, D, constrs_lb, constrs_a, constrs_b
 
 
+class MskProjection(object):
+  """The persistent Mosek model of `msk_pd_on_dc`,
+      built once per instance and re-solved across iterations
+      and active set updates.
+    The gradient is a Fusion `Parameter`, and the active lower
+      bounds are one constraint on the picked entries, replaced
+      at each call; the interior-point optimizer does not use an
+      initial point, so nothing else is kept between the solves.
+    It is called exactly as the functional `gd_method`s.
+  """
+  name = 'projected_gradient_on_D_cone'
+
+  def __init__(self, **kwargs):
+    self.kwargs = kwargs
+    self.param = None
+    self.model = None
+
+  def _objective(self, model, D, dF):
+    v = model.variable(1, dom.greaterThan(0))
+    model.objective(mf.ObjectiveSense.Minimize, v)
+    model.constraint(
+        expr.vstack(v, expr.flatten(expr.add(D, dF))), dom.inQCone())
+
+  def _variable(self, model, shape):
+    return model.variable("d", shape, dom.unbounded())
+
+  def build(self, param: QAPParam):
+    self.dispose()
+    shape = [param.n, param.n]
+    model = mf.Model(self.name)
+    D = self._variable(model, shape)
+    self.dF = model.parameter("dF", shape)
+    self._objective(model, D, self.dF)
+    self.constrs_a = model.constraint(expr.sum(D, 0), dom.equalsTo(0))
+    self.constrs_b = model.constraint(expr.sum(D, 1), dom.equalsTo(0))
+    self.constrs_lb = None
+    self.userCallback = set_mosek_model_params(model, **self.kwargs)
+    self.param, self.model, self.D = param, model, D
+    return model
+
+  def dispose(self):
+    if self.model is not None:
+      self.model.dispose()
+    self.param, self.model = None, None
+
+  def _active_bound(self, lb_x, lb_y):
+    """D = 0 on the active entries"""
+    if self.constrs_lb is not None:
+      self.constrs_lb.remove()
+    self.constrs_lb = self.model.constraint(
+        self.D.pick(lb_x.tolist(), lb_y.tolist()), dom.equalsTo(0))
+
+  def _active_dual(self, lb_x, lb_y):
+    """the handle of the multipliers, in the order of `lb_indices`"""
+    return self.constrs_lb
+
+  def __call__(self, param: QAPParam, dF, lb_indices, ub_indices=None,
+               **kwargs):
+    if self.model is None or param is not self.param:
+      self.build(param)
+    lb_x, lb_y = (np.asarray(ix) for ix in lb_indices)
+    self.dF.setValue(dF)
+    self._active_bound(lb_x, lb_y)
+    self.model.solve()
+    self.model.flushSolutions()
+    D_sol = self.D.level().reshape(dF.shape)
+    constrs_lb = self._active_dual(lb_x, lb_y)
+    return D_sol, self.model, self.D, constrs_lb, self.constrs_a, self.constrs_b
+
+
+class MskProjectionLP(MskProjection):
+  """The persistent Mosek model of `msk_pd_on_dc_lp`,
+    solved by the simplex optimizer; the active lower bounds
+    are a mask `Parameter` over all entries, so the model keeps
+    its shape and the basis and solution of the previous solve
+    warm-start the next.
+  """
+
+  def _objective(self, model, D, dF):
+    model.objective(mf.ObjectiveSense.Minimize, expr.dot(dF, D))
+
+  def _variable(self, model, shape):
+    return model.variable("d", shape, dom.inRange(-1, 1))
+
+  def build(self, param: QAPParam):
+    model = super().build(param)
+    shape = [param.n, param.n]
+    self.lb = model.parameter("lb", shape)
+    self.constrs_lb = model.constraint(
+        expr.mulElm(self.lb, self.D), dom.greaterThan(0))
+    self.mask = np.zeros(shape)
+    model.setSolverParam("optimizer", "freeSimplex")
+    return model
+
+  def _active_bound(self, lb_x, lb_y):
+    self.mask.fill(0)
+    self.mask[lb_x, lb_y] = 1
+    self.lb.setValue(self.mask)
+
+  def _active_dual(self, lb_x, lb_y):
+    return ProjectionDual(
+        self.constrs_lb.dual().reshape(self.mask.shape)[lb_x, lb_y])
+
+  def __call__(self, param: QAPParam, dF, lb_indices, ub_indices=None,
+               **kwargs):
+    solution = super().__call__(param, dF, lb_indices, ub_indices, **kwargs)
+    # warm start of the next solve
+    self.D.setLevel(solution[0].flatten())
+    return solution
+
+
 def msk_st(dp, x, param):
   """The Mosek model to compute the maximum stepsize
       of the line search
@@ -144,91 +276,326 @@ def msk_st(dp, x, param):
     return 0
 
 
+GD_METHODS = {
+    'msk_pd_on_dc': msk_pd_on_dc,
+    'msk_pd_on_dc_lp': msk_pd_on_dc_lp,
+    'np_pd_on_dc': np_pd_on_dc,
+    'msk_persistent': MskProjection,
+    'msk_persistent_lp': MskProjectionLP,
+}
+
+ST_METHODS = {
+    'msk_st': msk_st,
+    'np_st': np_st,
+}
+
+
+def save_checkpoint(path, x, iteration, tracer=None):
+  """write the iterate, the next iteration and the trace (if any)
+    to `path` (.npz) atomically, the active set follows from x
+  """
+  state = tracer.state() if isinstance(tracer, PhaseTracer) else {}
+  f_tmp = f"{path}.{os.getpid()}.tmp"
+  with open(f_tmp, 'wb') as f:
+    np.savez(f, x=x, iteration=iteration, **state)
+  os.replace(f_tmp, path)
+
+
+def load_checkpoint(path):
+  """the checkpoint at `path` as a dict, None if there is none"""
+  if not path or not os.path.exists(path):
+    return None
+  with np.load(path) as ckpt:
+    return dict(ckpt)
+
+
+class ActiveSet(object):
+  """The active lower bounds x_ij = 0 of Rosen's method as a mask.
+    At a stationary point of the projection, every bound whose
+    multiplier is below `release_ratio` times the most negative one
+    is released at once; if the direction of a batch release is
+    blocked right away, the batch is rolled back and only the most
+    negative one is released, the classical rule.
+    A mask met again at a release means cycling, the rest of the run
+    falls back to the classical rule.
+  The row/column-sum multipliers of the last projection are kept
+    as the warm start of the next one.
+  """
+
+  def __init__(self, tol=1e-4, release='batch', release_ratio=0.1):
+    self.tol = tol
+    self.batch = release == 'batch'
+    self.release_ratio = release_ratio
+    self.mask = None
+    self.dual = None
+    self._released = None
+    self._seen = set()
+
+  def update(self, x):
+    """the bounds active at x, a new tuning round"""
+    self.mask = x <= self.tol
+    self._released = None
+    return self
+
+  @property
+  def indices(self):
+    """the (rows, cols) of the active bounds, in row-major order,
+      as are the multipliers of `constrs_lb`
+    """
+    return np.nonzero(self.mask)
+
+  def release(self, dv):
+    """release the bounds by their multipliers `dv`
+
+    Returns:
+        int: number of released bounds, 0 if KKT holds
+    """
+    dv = np.asarray(dv)
+    if not dv.size or dv.min() >= 0:
+      return 0
+    key = hash(self.mask.tobytes())
+    if key in self._seen and self.batch:
+      logger.info("cycling active set, release one bound at a time")
+      self.batch = False
+    self._seen.add(key)
+    if self.batch:
+      sel = np.flatnonzero(dv <= self.release_ratio * dv.min())
+      # the most negative first, see `rollback`
+      sel = sel[np.argsort(dv[sel])]
+    else:
+      sel = dv.argmin()[None]
+    rows, cols = self.indices
+    self._released = (rows[sel], cols[sel])
+    self.mask[self._released] = False
+    return sel.size
+
+  def rollback(self):
+    """restore a blocked batch release but its most negative one
+
+    Returns:
+        bool: a batch was rolled back
+    """
+    if self._released is None or self._released[0].size <= 1:
+      return False
+    rows, cols = self._released
+    self.mask[rows[1:], cols[1:]] = True
+    self._released = None
+    return True
+
+
 def run_gradient_projection(x, param: QAPParam, nabla: QAPDerivative, **kwargs):
   # unpacking solver parameters
   max_iter = kwargs.get('max_iteration', 500)
   gd_method = kwargs.get('gd_method', msk_pd_on_dc_lp)
+  if isinstance(gd_method, str):
+    gd_method = GD_METHODS[gd_method]
+  if isinstance(gd_method, type):
+    # stateful projections are built once per run
+    gd_method = gd_method()
   st_method = kwargs.get('st_method', msk_st)
+  if isinstance(st_method, str):
+    st_method = ST_METHODS[st_method]
+  st_line_search = kwargs.get('st_line_search', 'grid')
   st_line_grids = kwargs.get('st_line_grids', 10)
   logging_interval = kwargs.get('logging_interval', 1)
+  tracer = kwargs.get('tracer') or NULL_TRACER
+  # an interval of 0 disables the checkpoints
+  checkpoint_interval = kwargs.get('checkpoint_interval', 50)
+  checkpoint = kwargs.get('checkpoint') if checkpoint_interval else None
+  active = ActiveSet(
+      release=kwargs.get('as_release', 'batch'),
+      release_ratio=kwargs.get('as_release_ratio', 0.1))
 
   # unpacking params
   n = param.n
   xo = param.xo
-  best_obj = nabla.obj(xo)
+  best_obj = nabla.obj(xo) if xo is not None else None
   final_iter = 0
 
+  # resume from the latest checkpoint
+  start = kwargs.get('start_iteration', 0)
+  ckpt = load_checkpoint(checkpoint) if kwargs.get('resume') else None
+  if ckpt is not None:
+    x, start = ckpt['x'], int(ckpt['iteration'])
+    if isinstance(tracer, PhaseTracer):
+      tracer.load_state(ckpt)
+    logger.info(f"resume from {checkpoint} @{start}")
+
   # start iterations
-  for i in range(max_iter):
+  i = start
+  try:
+    for i in range(start, max_iter):
+      if checkpoint and i > start and i % checkpoint_interval == 0:
+        save_checkpoint(checkpoint, x, i, tracer)
+      tracer.begin(i)
+
+      # the diagnostics are computed only if they are logged
+      _logging = i % logging_interval == 0 and logger.isEnabledFor(logging.INFO)
+      _ac = False
+      with tracer.phase('gradient'):
+        _obj = nabla.obj(x)
+        d0 = nabla.partial_f(x)
+
+      # active lower bound constraints
+      active.update(x)
+
+      if _logging:
+        logger.info(f'=====iteration: {i}====')
+
+      # do projection
+      while True:
+        # compute gradient projection
+        with tracer.phase('projection'):
+          dp, m, D, constrs_lb, constrs_a, constrs_b = gd_method(
+              param,
+              d0,
+              active.indices,
+              dual0=active.dual,
+          )
+        tracer.count('projections')
+        # the Mosek models are in float64, stay in the precision of x
+        dp = dp.astype(x.dtype, copy=False)
+        if isinstance(constrs_a, ProjectionDual):
+          active.dual = (constrs_a.dual(), constrs_b.dual())
+
+        # evaluate norm of the projected gradient
+        ndf = np.abs(dp).max()
+
+        # fetch maximum stepsize, a vanishing direction is stationary
+        #  on the face, stepping far along its roundoff leaves the
+        #  constraints behind
+        with tracer.phase('stepsize'):
+          stp = float(st_method(dp, x, param)) if ndf > 1e-6 else 0.
+
+        # active set tuning if ||P(dF)|| < eps
+        if ndf <= 1e-6 and stp <= 1e-6:
+          _ac = True
+          logger.info(f"start active set tuning @{i}")
+          try:
+            with tracer.phase('active_set'):
+              # this releases the most negative dual variables
+              k = active.release(constrs_lb.dual())
+            if k:
+              tracer.count('pops', k)
+              continue
+            break
+          except Exception as e:
+            logger.info(f"finish active set tuning @{i}")
+            break
+        elif stp <= 1e-6 and active.rollback():
+          # the batch released a bound that blocks the direction
+          continue
+        elif _ac:
+          logger.info(f"finish active set tuning @{i}")
+          break
+        else:
+          break
 
-    _obj = nabla.obj(x)
-    _logging = i % logging_interval == 0
-    _ac = False
-    d0 = nabla.partial_f(x)
+      tracer.record(obj=_obj, grad_norm=ndf)
+      if _logging:
+        logger.info(f"gradient norm: {ndf}")
 
-    # indices of active lower bound constraints
-    lb_x, lb_y = np.where(x <= 1e-4)
-    lb_x = lb_x.tolist()
-    lb_y = lb_y.tolist()
+      if stp <= 1e-6:
+        final_iter = i
+        break
 
-    if _logging:
-      logger.info(f'=====iteration: {i}====')
+      with tracer.phase('line_search'):
+        if st_line_search == 'exact':
+          i_s, vs = exact_line_search(nabla, x, dp, d0, stp, _obj)
+          x = nabla.move(x, dp, i_s)
+        else:
+          # the objective is quadratic along dp
+          b, a = (d0 * dp).sum(), nabla.curvature(dp)
+          ts = [ig / st_line_grids * stp for ig in range(1, st_line_grids + 1)]
+          objs = [(ig, _obj + b * t + a * t * t) for ig, t in enumerate(ts, 1)]
+
+          i_s, vs = min(objs, key=lambda x: x[-1])
+          x = nabla.move(x, dp, i_s / st_line_grids * stp)
+      if _logging:
+        logger.info(f"steps: {i_s}, {vs}, {stp}")
+        # update solution
+        if best_obj:
+          logger.info(
+              f"obj: {vs}, {vs - _obj}, gap: {(vs - best_obj)/best_obj}")
+        else:
+          logger.info(f"obj: {vs}, {vs - _obj}")
+        logger.info(f"trace deficiency: {n - (x * x).sum()}")
+
+  except Exception:
+    # keep the progress, e.g., if the projection model fails
+    if checkpoint:
+      save_checkpoint(checkpoint, x, i, tracer)
+    raise
 
-    # do projection
-    while True:
-      # compute gradient projection
-      dp, m, D, constrs_lb, constrs_a, constrs_b = gd_method(
-          param,
-          d0,
-          (lb_x, lb_y),
-      )
-
-      # evaluate norm of the projected gradient
-      ndf = np.abs(dp).max()
-
-      # fetch maximum stepsize
-      stp = st_method(dp, x, param)
-
-      # active set tuning if ||P(dF)|| < eps
-      if ndf <= 1e-6 and stp <= 1e-6:
-        _ac = True
-        logger.info(f"start active set tuning @{i}")
-        try:
-          dv = constrs_lb.dual()
-          idx = dv.argmin()
-          # this pops most negative dual variables
-          if dv[idx] < 0:
-            lb_x.pop(idx)
-            lb_y.pop(idx)
-            continue
-          break
-        except Exception as e:
-          logger.info(f"finish active set tuning @{i}")
-          break
-      elif _ac:
-        logger.info(f"finish active set tuning @{i}")
-        break
-      else:
-        break
+  logger.info(f"finish algorithm iteration@{final_iter}")
+  if isinstance(gd_method, MskProjection):
+    gd_method.dispose()
+  if checkpoint and os.path.exists(checkpoint):
+    os.remove(checkpoint)
 
-    if _logging:
-      logger.info(f"gradient norm: {ndf}")
+  return x
 
-    if stp <= 1e-6:
-      final_iter = i
-      break
 
-    objs = [(ig, nabla.obj(x + ig / st_line_grids * stp * dp))
-            for ig in range(1, st_line_grids + 1)]
+def run_gradient_projection_batch(X, param: QAPParam, nabla: QAPDerivative,
+                                  **kwargs):
+  """Rosen's method on a (K, n, n) stack of starting points,
+    each start keeps its own active set and stepsize while
+    the gradients, projections and line searches are batched,
+    the converged starts are dropped from the batch.
 
-    i_s, vs = min(objs, key=lambda x: x[-1])
-    x = x + i_s / st_line_grids * stp * dp
-    if _logging:
-      logger.info(f"steps: {i_s}, {vs}, {stp}")
-      # update solution
-      logger.info(f"obj: {vs}, {vs - _obj}, gap: {(vs - best_obj)/best_obj}")
-      logger.info(f"trace deficiency: {n - x.dot(x.T).trace()}")
+  Args:
+      X: starting points, (K, n, n)
+      param (QAPParam): QAP params
+      nabla (QAPDerivative): derivative of the objective
 
-  logger.info(f"finish algorithm iteration@{final_iter}")
+  Returns:
+      the final iterates, (K, n, n)
+  """
+  max_iter = kwargs.get('max_iteration', 500)
+  logging_interval = kwargs.get('logging_interval', 1)
+
+  X = X.copy()
+  alive = np.arange(X.shape[0])
+  final_iter = 0
+  for i in range(max_iter):
+    final_iter = i
+    x = X[alive]
+    _obj = nabla.obj(x)
+    d0 = nabla.partial_f(x)
+    # masks of free entries, i.e., inactive lower bounds
+    free = x > 1e-4
+    dp, lam, dual = np_pd_on_dc_batch(d0, free, **kwargs)
+    # a vanishing direction is stationary on the face, see
+    #  `run_gradient_projection`
+    stp = np.where(np.abs(dp).max((-2, -1)) > 1e-6, np_st(dp, x, param), 0)
+
+    # active set tuning for the starts with ||P(dF)|| < eps,
+    #  each pops its most negative dual variable per round
+    while True:
+      ndf = np.abs(dp).max((-2, -1))
+      lam_fixed = np.where(free, np.inf, lam).reshape(len(alive), -1)
+      idx = lam_fixed.argmin(1)
+      sub = np.flatnonzero((ndf <= 1e-6) & (stp <= 1e-6) &
+                           (lam_fixed[np.arange(len(alive)), idx] < 0))
+      if not sub.size:
+        break
+      free.reshape(len(alive), -1)[sub, idx[sub]] = True
+      dp[sub], lam[sub], (dual[0][sub], dual[1][sub]) = np_pd_on_dc_batch(
+          d0[sub], free[sub], (dual[0][sub], dual[1][sub]), **kwargs)
+      stp[sub] = np.where(
+          np.abs(dp[sub]).max((-2, -1)) > 1e-6, np_st(dp[sub], x[sub], param),
+          0)
+
+    t, vs = exact_line_search(nabla, x, dp, d0, stp, _obj)
+    X[alive] = x + t[:, None, None] * dp
+
+    if i % logging_interval == 0 and logger.isEnabledFor(logging.INFO):
+      logger.info(f'=====iteration: {i}, starts: {len(alive)}====')
+      logger.info(f"obj: {vs.min()}, {(vs - _obj).min()}")
+
+    alive = alive[stp > 1e-6]
+    if not alive.size:
+      break
 
-  return x
\ No newline at end of file
+  logger.info(f"finish algorithm iteration@{final_iter}")
+  return X
@@ -1,6 +1,6 @@
 # @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
 # @project: models
-# @file: /qap_gradient_proj.py
+# @file: /qap_gradient_proj_glp.py
 # @created: Sunday, 27th September 2020
 # @author: brentian (chuwzhang@gmail.com)
 # @modified: brentian (chuwzhang@gmail.com>)
@@ -11,5 +11,86 @@
 #  The key is to compute projections
 
 from .qap_utils import *
+from .qap_projection import *
+from .qap_stepsize import *
 
 logger = logging.getLogger('qap.run.gradient_projection_glp')
+
+
+def run_gradient_projection_glp(x, param: QAPParam, nabla: QAPDerivative,
+                                **kwargs):
+  """Goldstein-Levitin-Poljak method,
+      d = P(x - s⋅∇F(x)) - x, x ← x + t⋅d, t ∈ [0, 1]
+    where P is the Euclidean projection onto the doubly stochastic
+    matrices by `proj_birkhoff`, warm-started by the multipliers of
+    the previous iterate, s is the Barzilai-Borwein stepsize and t
+    is given by the exact line search.
+    No active set is needed since P handles x ≥ 0.
+
+  Args:
+      x: starting point
+      param (QAPParam): QAP params
+      nabla (QAPDerivative): derivative of the objective
+
+  Returns:
+      the final iterate
+  """
+  max_iter = kwargs.get('max_iteration', 500)
+  logging_interval = kwargs.get('logging_interval', 1)
+  tol = kwargs.get('glp_tol', 1e-6)
+  proj_tol = kwargs.get('proj_tol', 1e-9)
+
+  # unpacking params
+  n = param.n
+  xo = param.xo
+  best_obj = nabla.obj(xo) if xo is not None else None
+  final_iter = 0
+
+  dual = None
+  x_prev = g_prev = None
+  s = kwargs.get('glp_step')
+  for i in range(max_iter):
+    final_iter = i
+    _obj = nabla.obj(x)
+    # the diagnostics are computed only if they are logged
+    _logging = i % logging_interval == 0 and logger.isEnabledFor(logging.INFO)
+    d0 = nabla.partial_f(x)
+
+    # BB stepsize, <Δx, Δg> ≤ 0 keeps the previous one
+    if x_prev is not None:
+      dx, dg = x - x_prev, d0 - g_prev
+      dxg = (dx * dg).sum()
+      if dxg > 0:
+        s = (dx * dx).sum() / dxg
+    if s is None:
+      s = 1 / max(np.abs(d0).max(), 1e-12)
+    x_prev, g_prev = x, d0
+
+    y, dual, it = proj_birkhoff(x - s * d0, dual, tol=proj_tol)
+    dp = y - x
+    ndf = np.abs(dp).max()
+
+    if _logging:
+      logger.info(f'=====iteration: {i}====')
+      logger.info(f"gradient norm: {ndf}, stepsize: {s}, projection: {it}")
+
+    if ndf <= tol:
+      break
+
+    t, vs = exact_line_search(nabla, x, dp, d0, 1.0, _obj)
+    if t <= 0:
+      # P(x - s∇F) is not a descent within [0, 1], shrink s
+      s /= 2
+      continue
+    x = nabla.move(x, dp, t)
+    if _logging:
+      logger.info(f"steps: {t}, {vs}")
+      if best_obj:
+        logger.info(
+            f"obj: {vs}, {vs - _obj}, gap: {(vs - best_obj)/best_obj}")
+      else:
+        logger.info(f"obj: {vs}, {vs - _obj}")
+      logger.info(f"trace deficiency: {n - (x * x).sum()}")
+
+  logger.info(f"finish algorithm iteration@{final_iter}")
+  return x
@@ -0,0 +1,150 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_mirror_descent.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 5:02:16 pm
+# @description:
+#  Entropic mirror descent over the Birkhoff polytope,
+#    X ← Π_KL(X ⊙ exp(-η∇F(X)))
+#  where the KL projection is the Sinkhorn scaling, kept in the
+#  log domain and batched over several (η, μ) settings at once.
+
+from .qap_utils import *
+from .qap_gradient_proj import *
+
+logger = logging.getLogger('qap.run.mirror_descent')
+
+
+def _logsumexp(a, axis):
+  # scipy.special.logsumexp without its overhead on small arrays
+  m = a.max(axis, keepdims=True)
+  return np.log(np.exp(a - m).sum(axis)) + m.squeeze(axis)
+
+
+def log_sinkhorn(L, g0=None, tol=1e-9, max_iter=1000):
+  """The Sinkhorn scaling of exp(L) in the log domain,
+      log X = L + fe' + eg', s.t. Xe = e, X'e = e
+
+  Args:
+      L: log of the kernel, or a (K, n, n) stack
+      g0: warm start of the column potentials, Defaults to None.
+      tol: tolerance of the marginal residual ‖X'e - e‖₁,
+        a scalar or one for each member of the stack
+
+  Returns:
+      log X, the potentials (f, g), number of rounds
+  """
+  g = np.zeros(L.shape[:-2] + L.shape[-1:]) if g0 is None else g0
+  it = 0
+  for it in range(max_iter):
+    f = -_logsumexp(L + g[..., None, :], -1)
+    logX = L + f[..., :, None] + g[..., None, :]
+    # rows are exact after the f-update, check the columns
+    c = _logsumexp(logX, -2)
+    if np.all(np.abs(np.expm1(c)).sum(-1) <= tol):
+      break
+    g = g - c
+  return logX, (f, g), it
+
+
+def run_mirror_descent(logX, etas, param: QAPParam, nabla: QAPDerivative,
+                       **kwargs):
+  """Entropic mirror descent on a (K, n, n) stack,
+    each member with its own stepsize η_k, normalized by
+    the max-norm of its gradient; a member stops when its
+    iterate moves less than `md_tol` per row in ℓ1, or its best
+    objective improves less than `md_obj_tol` relatively
+    in `md_patience` steps.
+    The kernel accumulates the steps, log X = L + fe' + eg',
+    so the potentials of the last projection warm-start the next,
+    which needs to be no finer than the move it projects.
+
+  Args:
+      logX: log of the starting points, (K, n, n)
+      etas: stepsizes, (K, )
+      param (QAPParam): QAP params
+      nabla (QAPDerivative): derivative of the objective
+
+  Returns:
+      log of the final iterates, (K, n, n)
+  """
+  max_iter = kwargs.get('max_iteration', 500)
+  logging_interval = kwargs.get('logging_interval', 1)
+  tol = kwargs.get('md_tol', 1e-6)
+  obj_tol = kwargs.get('md_obj_tol', 1e-4)
+  patience = kwargs.get('md_patience', 20)
+  sinkhorn_tol = kwargs.get('sinkhorn_tol', 1e-6)
+  # a capped projection is resumed by the next one
+  sinkhorn_iter = kwargs.get('sinkhorn_iteration', 30)
+
+  n = param.n
+  etas = np.asarray(etas, dtype=np.float64)[:, None, None]
+  active = np.ones(len(etas), dtype=bool)
+  L, g = logX, None
+  X = np.exp(logX)
+  best = nabla.obj(X)
+  # steps since the best objective last improved
+  stall = np.zeros(len(etas), dtype=int)
+  # the ℓ1 move of the last step, per row
+  move = np.ones(len(etas))
+  final_iter = 0
+  for i in range(max_iter):
+    final_iter = i
+    d0 = nabla.partial_f(X)
+    scale = np.abs(d0).max((-2, -1), keepdims=True)
+    step = np.where(active[:, None, None], etas / np.maximum(scale, 1e-12), 0)
+    L = L - step * d0
+    logX, (_, g), it = log_sinkhorn(
+        L, g, tol=np.maximum(sinkhorn_tol, 0.1 * n * move),
+        max_iter=sinkhorn_iter)
+    X_new = np.exp(logX)
+    obj = nabla.obj(X_new)
+    move = np.abs(X_new - X).sum((-2, -1)) / n
+    improved = obj < best - obj_tol * np.maximum(np.abs(best), 1)
+    stall = np.where(improved, 0, stall + 1)
+    best = np.minimum(best, obj)
+    active &= (move > tol) & (stall < patience)
+    X = X_new
+
+    if i % logging_interval == 0 and logger.isEnabledFor(logging.INFO):
+      logger.info(f'=====iteration: {i}====')
+      logger.info(f"obj: {obj.tolist()}, sinkhorn: {it}, "
+                  f"active: {active.sum()}")
+    if not active.any():
+      break
+
+  logger.info(f"finish algorithm iteration@{final_iter}")
+  return logX
+
+
+def sinkhorn_mirror_descent(param: QAPParam, **kwargs):
+  """Exact penalty + Trace relaxation
+      min_X f = tr(A'XBX') + μ⋅|tr(XX') − n|
+    solved by entropic mirror descent, see `run_mirror_descent`,
+    for all pairs of `md_etas` and `md_mus` at once,
+    each final iterate is rounded by a linear assignment.
+
+  Returns:
+      X_sol: the best permutation matrix
+  """
+  n = param.n
+
+  # hyper parameters
+  etas = kwargs.get('md_etas') or [0.5, 1.0, 2.0, 5.0]
+  mus = kwargs.get('md_mus') or [kwargs.get('mu', 0.1)]
+  etas, mus = map(np.ravel, np.meshgrid(etas, mus))
+
+  # 𝛁F
+  nabla = QAPDerivativeL2Penalty(param, mus)
+
+  # start from the barycenter
+  logX = np.full((len(etas), n, n), -np.log(n))
+  logX = run_mirror_descent(logX, etas, param, nabla, **kwargs)
+
+  P = np.array([to_perm(x) for x in logX])
+  objs = perm_obj(param.A0, param.B0, P)
+  for eta, mu, obj in zip(etas, mus, objs):
+    logger.info(f"η: {eta}, μ: {mu}, rounded obj: {obj}")
+  return perm_matrix(P[objs.argmin()])
@@ -9,3 +9,9 @@
 
 from .qap_model_l2 import *
 from .qap_utils import *
+from .qap_local_search import *
+from .qap_tabu import *
+from .qap_bounds import *
+from .qap_frank_wolfe import *
+from .qap_mirror_descent import *
+from .qap_trace import *
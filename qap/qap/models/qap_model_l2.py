@@ -10,6 +10,9 @@
 
 from .qap_utils import *
 from .qap_gradient_proj import *
+from .qap_gradient_proj_glp import *
+
+logger = logging.getLogger('qap.run.l2')
 
 
 def l2_naive(mu, param=None, rd=False, **kwargs):
@@ -25,7 +28,7 @@ def l2_naive(mu, param=None, rd=False, **kwargs):
   Returns:
       X_sol: solution
   """
-  A, B, n, m, e, E, ab = param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+  A, B, n, m = to_dense(param.A), to_dense(param.B), param.n, param.m
   # do Cholesky
   n = A.shape[0]
   P = np.kron(B.T, A.T) + mu * np.eye(n * n)
@@ -57,6 +60,83 @@ def l2_naive(mu, param=None, rd=False, **kwargs):
   return X_sol
 
 
+def _kron_free_factors(A, B, mu):
+  """the eigen-factors of the quadratic form of `l2_naive`,
+      tr(A'XBX') + μ⋅tr(XX') = Σ_lk W_lk (Ua'XUb)_lk²,
+    where A = Ua⋅diag(λa)⋅Ua', B = Ub⋅diag(λb)⋅Ub' and W = λa⋅λb' + μ,
+    since the eigenvalues of B'⊗A' are the products λb_k⋅λa_l.
+    If only one of A, B is symmetric, the other one is replaced
+    by its symmetric part, which keeps the form unchanged.
+
+  Returns:
+      Ua, Ub, W
+  """
+  A, B = to_dense(A), to_dense(B)
+  sa, sb = is_symmetric(A), is_symmetric(B)
+  if not (sa or sb):
+    raise ValueError(
+        "the Kronecker-free form needs A or B symmetric, use `l2_naive`")
+  if not sa:
+    A = (A + A.T) / 2
+  if not sb:
+    B = (B + B.T) / 2
+  la, Ua = np.linalg.eigh(A)
+  lb, Ub = np.linalg.eigh(B)
+  W = la[:, None] * lb[None, :] + mu
+  if W.min() < 0:
+    raise ValueError(
+        f"the form is not convex, μ should be at least {mu - W.min():.4e}")
+  return Ua, Ub, W
+
+
+def l2_naive_structured(mu, param=None, rd=False, **kwargs):
+  """the same model as `l2_naive` without the Kronecker product,
+      min_X Σ_lk W_lk Y_lk², Y = Ua'XUb,
+    see `_kron_free_factors`; the model has O(n³) nonzeros
+    instead of the O(n⁴) dense Cholesky factor of B'⊗A' + μI.
+
+  Args:
+      mu (float): scaling parameter
+      param (QAPParam, optional):. Defaults to None.
+      rd (bool, optional): use geometric rounding, if True, the Mosek
+        model relaxes the integral constraints. Defaults to False.
+
+  Returns:
+      X_sol: solution
+  """
+  n = param.n
+  Ua, Ub, W = _kron_free_factors(param.A, param.B, mu)
+
+  model = mf.Model('qap')
+
+  if rd:
+    X = model.variable([n, n], dom.inRange(0, 1))
+  else:
+    X = model.variable("x", [n, n], dom.binary())
+  # Z = XUb, so that Y = Ua'Z has n³ nonzeros
+  Z = model.variable([n, n], dom.unbounded())
+  model.constraint(expr.sub(Z, expr.mul(X, Ub)), dom.equalsTo(0))
+  Y = expr.mul(Ua.T, Z)
+  m = expr.flatten(expr.mulElm(np.sqrt(W), Y))
+  v = model.variable(1, dom.greaterThan(0.0))
+  model.constraint(expr.sum(X, 0), dom.equalsTo(1))
+  model.constraint(expr.sum(X, 1), dom.equalsTo(1))
+  model.constraint(expr.vstack(v, m), dom.inQCone())
+  model.objective(mf.ObjectiveSense.Minimize, v)
+
+  # set params
+  userCallback = set_mosek_model_params(model, **kwargs)
+
+  model.solve()
+
+  model.flushSolutions()
+  X_sol = X.level().reshape(n, n)
+  if rd:
+    x, _ = extract_sol_rounding(X_sol, param.A, param.B)
+    return x
+  return X_sol
+
+
 def l2_conic_georound(param, rd=True, **kwargs):
   """a better "naive" formulation, 
       min tr(M'SM), and R'R = S+δI, M = (XB, AX)'
@@ -70,7 +150,7 @@ def l2_conic_georound(param, rd=True, **kwargs):
   Returns:
       X_sol: solution
   """
-  A, B, n, m, e, E, ab = param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+  A, B, n, m = to_dense(param.A), to_dense(param.B), param.n, param.m
   S = np.block([[np.zeros((m, m)), 0.5 * np.eye(m)],
                 [0.5 * np.eye(m), np.zeros((m, m))]]) + 1 * np.eye(2 * n)
   K = np.linalg.cholesky(S)
@@ -110,8 +190,7 @@ def l2_exact_penalty_gradient_proj(param, **kwargs):
     solved by gradient projection method
   """
 
-  A, B, n, m, e, E, ab = \
-    param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+  n = param.n
 
   # hyper parameters
   mu = kwargs.get('mu', 0.1)
@@ -121,15 +200,113 @@ def l2_exact_penalty_gradient_proj(param, **kwargs):
   opt = param.best_obj
 
   # initialize
-  x = x0 = np.ones((n, n)) / n
+  x = x0 = np.ones((n, n), dtype=param.dtype) / n
 
   # 𝛁F
-  nabla = QAPDerivativeL2Penalty(param, mu)
+  if kwargs.get('cache_derivative', True):
+    derivative = QAPDerivativeL2PenaltyCache
+  else:
+    derivative = QAPDerivativeL2Penalty
+  nabla = derivative(param, mu)
+
+  # in a lower precision, the last iterations are refined in float64
+  refine = kwargs.get('refine_iteration', 50)
+  if param.dtype == np.float64 or not refine:
+    return run_gradient_projection(x, param, nabla, **kwargs)
 
-  x_sol = run_gradient_projection(x, param, nabla, **kwargs)
+  max_iter = kwargs.get('max_iteration', 500)
+  start = max(max_iter - refine, 0)
+  # the refinement keeps its own checkpoint, the one of the
+  #  float32 phase is removed once it finishes
+  checkpoint = kwargs.get('checkpoint')
+  if not kwargs.get('checkpoint_interval', 50):
+    checkpoint = None
+  ckpt_refine = None
+  if checkpoint:
+    root, ext = os.path.splitext(checkpoint)
+    ckpt_refine = f"{root}.refine{ext}"
+  refining = kwargs.get('resume') and load_checkpoint(ckpt_refine) is not None
+
+  x_sol = x.astype(np.float64)
+  if not refining:
+    x_sol = run_gradient_projection(x, param, nabla, **{
+        **kwargs, 'max_iteration': start
+    })
+    # the row/column sums drift by the float32 roundoff, restore them
+    x_sol, _, _ = proj_birkhoff(x_sol.astype(np.float64))
+    if ckpt_refine:
+      save_checkpoint(ckpt_refine, x_sol, start, kwargs.get('tracer'))
+  param = param.astype(np.float64)
+  nabla = derivative(param, mu)
+  logger.info(f"refine in float64 for {refine} iterations")
+  x_sol = run_gradient_projection(x_sol, param, nabla, **{
+      **kwargs, 'start_iteration': start,
+      'checkpoint': ckpt_refine
+  })
   return x_sol
 
 
+def l2_exact_penalty_glp(param, **kwargs):
+  """Exact penalty + Trace relaxation
+      min_X f = tr(A'XBX') + μ⋅|tr(XX') − n|
+    solved by Goldstein-Levitin-Poljak method
+  """
+  n = param.n
+
+  # hyper parameters
+  mu = kwargs.get('mu', 0.1)
+
+  # initialize
+  x = np.ones((n, n)) / n
+
+  # 𝛁F
+  if kwargs.get('cache_derivative', True):
+    nabla = QAPDerivativeL2PenaltyCache(param, mu)
+  else:
+    nabla = QAPDerivativeL2Penalty(param, mu)
+
+  x_sol = run_gradient_projection_glp(x, param, nabla, **kwargs)
+  return x_sol
+
+
+def l2_exact_penalty_gradient_proj_multistart(param, **kwargs):
+  """Exact penalty + Trace relaxation, the same model as
+    `l2_exact_penalty_gradient_proj` solved from K starting points
+    at once, the first one is the barycenter and the others are
+    random doubly stochastic matrices.
+
+  Returns:
+      X_sol: solution with the least penalized objective,
+        or the (K, n, n) stack if `return_all`
+  """
+  n = param.n
+
+  # hyper parameters
+  mu = kwargs.get('mu', 0.1)
+  n_starts = kwargs.get('n_starts', 8)
+  rs = np.random.RandomState(kwargs.get('seed', 1))
+
+  # initialize
+  X0 = rs.exponential(1, size=(n_starts, n, n))
+  for _ in range(1000):
+    X0 /= X0.sum(2, keepdims=True)
+    X0 /= X0.sum(1, keepdims=True)
+    if np.abs(X0.sum(2) - 1).max() < 1e-12:
+      break
+  X0[0] = 1 / n
+  X0 = X0.astype(param.dtype, copy=False)
+
+  # 𝛁F
+  nabla = QAPDerivativeL2Penalty(param, mu)
+
+  X = run_gradient_projection_batch(X0, param, nabla, **kwargs)
+  objs = nabla.obj(X)
+  logger.info(f"multi-start objectives: {objs.tolist()}")
+  if kwargs.get('return_all', False):
+    return X
+  return X[objs.argmin()]
+
+
 if __name__ == "__main__":
   kwargs = {}
   instance_name = 'esc16h'
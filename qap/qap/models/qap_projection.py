@@ -0,0 +1,207 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_projection.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 10:12:31 am
+# @description:
+#  Solver-free projections used by the gradient projection methods.
+#  The tangent space of the doubly stochastic constraints with the
+#  active lower bounds fixed is
+#    S = {D: De = 0, D'e = 0, D_ij = 0 for (i, j) in L}
+#  and P(G) = M ⊙ (G - ae' - eb'), M the mask of free entries,
+#  where (a, b) solves the (2n x 2n) normal equations of the
+#  row/column-sum constraints.
+
+import numpy as np
+
+from .qap_utils import *
+
+
+class ProjectionDual(object):
+  """A stand-in of the Fusion constraint handles,
+    so that the numpy backends share the return contract of
+    the Mosek projection models, i.e., `constrs_lb.dual()`
+  """
+
+  def __init__(self, values):
+    self.values = values
+
+  def dual(self):
+    return self.values
+
+
+def _row_col_dual(G, M, dual0=None, tol=1e-12, max_iter=None):
+  """solve the normal equations of the row/column-sum constraints
+      [diag(Me)  M       ] [a]   [(M ⊙ G)e ]
+      [M'        diag(M'e)] [b] = [(M ⊙ G)'e]
+    by Jacobi preconditioned conjugate gradient,
+    the system is PSD and consistent so CG stays in its range.
+
+  Args:
+      G: the matrix to be projected
+      M: the (float) mask of free entries
+      dual0: warm start (a, b), Defaults to None.
+
+  Returns:
+      a, b, number of CG iterations
+  """
+  n = G.shape[-1]
+  MG = M * G
+  rm, cm = M.sum(-1), M.sum(-2)
+  h = np.concatenate([MG.sum(-1), MG.sum(-2)], axis=-1)
+  # empty rows/cols have no equation, keep them out of the system
+  dg = np.concatenate([rm, cm], axis=-1)
+  pre = np.where(dg > 0, 1 / np.maximum(dg, 1), 0)
+
+  def matvec(y):
+    a, b = y[..., :n], y[..., n:]
+    top = rm * a + (M @ b[..., None])[..., 0]
+    bottom = (a[..., None, :] @ M)[..., 0, :] + cm * b
+    return np.concatenate([top, bottom], axis=-1)
+
+  y = np.zeros_like(h) if dual0 is None else np.concatenate(dual0, axis=-1)
+  r = h - matvec(y)
+  z = pre * r
+  p = z
+  rz = (r * z).sum(-1, keepdims=True)
+  h_norm = np.maximum(np.abs(h).max(-1, keepdims=True), 1)
+  max_iter = max_iter or 2 * n + 1
+  it = 0
+  for it in range(max_iter):
+    # freeze the converged ones, the system is singular and
+    #  iterating on a vanishing residual drifts off
+    done = np.abs(r).max(-1, keepdims=True) <= tol * h_norm
+    if done.all():
+      break
+    Kp = matvec(p)
+    pKp = (p * Kp).sum(-1, keepdims=True)
+    alpha = np.where(~done & (pKp > 0), rz / np.where(pKp > 0, pKp, 1), 0)
+    y = y + alpha * p
+    r = r - alpha * Kp
+    z = pre * r
+    rz_new = (r * z).sum(-1, keepdims=True)
+    beta = np.where(rz > 0, rz_new / np.where(rz > 0, rz, 1), 0)
+    p = z + beta * p
+    rz = rz_new
+  return y[..., :n], y[..., n:], it
+
+
+def np_pd_on_dc(
+    param: QAPParam,
+    dF,  # gradient: \nabla dF
+    lb_indices,
+    ub_indices=None,
+    **kwargs):
+  """The numpy counterpart of `msk_pd_on_dc`,
+      the projected gradient onto orthogonal constraints.
+     The model:
+      min ||D + F||_F
+    is solved by D = -P(F); when no lower bound is active
+    the projection is closed form, otherwise the multipliers
+    of row/column-sums are computed by `_row_col_dual`.
+  Args:
+      param (QAPParam): QAP params
+      dF: gradient, dF
+      lb_indices: the indices of `active` lower bound
+        inequality constraints
+      ub_indices: not used
+      dual0: warm start of the row/column-sum multipliers
+  Returns:
+      solution, None, None, and handles of the multipliers
+        for lb, row-sum and column-sum constraints,
+        the lb multipliers follow the order of `lb_indices` and
+        a negative one means releasing the bound descends.
+  """
+  n = param.n
+  lb_x, lb_y = lb_indices
+  if len(lb_x) == 0:
+    r, c = dF.sum(1), dF.sum(0)
+    s = r.sum() / (2 * n * n)
+    a, b = r / n - s, c / n - s
+    D_sol = -(dF - a[:, None] - b[None, :])
+    return D_sol, None, None, ProjectionDual(
+        np.zeros(0)), ProjectionDual(a), ProjectionDual(b)
+
+  M = np.ones((n, n), dtype=dF.dtype)
+  M[lb_x, lb_y] = 0
+  a, b, _ = _row_col_dual(
+      dF,
+      M,
+      dual0=kwargs.get('dual0'),
+      tol=kwargs.get('proj_tol') or default_tol(dF.dtype),
+      max_iter=kwargs.get('proj_max_iter'))
+  R = dF - a[:, None] - b[None, :]
+  D_sol = -M * R
+  return D_sol, None, None, ProjectionDual(
+      R[lb_x, lb_y]), ProjectionDual(a), ProjectionDual(b)
+
+
+def np_pd_on_dc_batch(dF, M, dual0=None, **kwargs):
+  """The projected gradients of a (K, n, n) stack,
+      D = -P(dF) with the free entries given by the masks M
+
+  Args:
+      dF: gradients, (K, n, n)
+      M: (bool) masks of free entries, (K, n, n)
+      dual0: warm start of the row/column-sum multipliers
+
+  Returns:
+      directions, multipliers of all entries
+        (only meaningful on fixed ones),
+        and the row/column-sum multipliers (a, b)
+  """
+  Mf = M.astype(dF.dtype)
+  a, b, _ = _row_col_dual(
+      dF,
+      Mf,
+      dual0=dual0,
+      tol=kwargs.get('proj_tol') or default_tol(dF.dtype),
+      max_iter=kwargs.get('proj_max_iter'))
+  R = dF - a[..., :, None] - b[..., None, :]
+  return -Mf * R, R, (a, b)
+
+
+def _simplex_threshold(V):
+  """the thresholds τ of the projections onto the simplex
+      Σ_j (v_j - τ)_+ = 1
+    over the last axis of V, by sorting.
+  """
+  U = -np.sort(-V, axis=-1)
+  css = U.cumsum(-1) - 1
+  k = np.arange(1, V.shape[-1] + 1)
+  rho = (U - css / k > 0).sum(-1, keepdims=True)
+  return np.take_along_axis(css, rho - 1, -1)[..., 0] / rho[..., 0]
+
+
+def proj_birkhoff(Y, dual0=None, tol=1e-9, max_iter=1000):
+  """The Euclidean projection onto the doubly stochastic matrices,
+      min ||X - Y||_F, s.t. Xe = e, X'e = e, X ≥ 0,
+    by block coordinate ascent of the dual, so that
+      X = (Y - ae' - eb')_+,
+    each block, i.e., all rows or all columns, is the exact
+    projection onto the simplices by their thresholds.
+
+  Args:
+      Y: the matrix to be projected, or a (K, n, n) stack
+      dual0: warm start (a, b), e.g., from the previous iterate,
+        Defaults to None.
+      tol: tolerance of the row/column-sum residuals
+
+  Returns:
+      X, the multipliers (a, b), number of rounds
+  """
+  if dual0 is None:
+    b = np.zeros(Y.shape[:-2] + Y.shape[-1:])
+  else:
+    b = dual0[1]
+  it = 0
+  for it in range(max_iter):
+    a = _simplex_threshold(Y - b[..., None, :])
+    b = _simplex_threshold(np.swapaxes(Y - a[..., :, None], -1, -2))
+    X = np.maximum(Y - a[..., :, None] - b[..., None, :], 0)
+    # columns are exact after the b-block, check the rows
+    if np.abs(X.sum(-1) - 1).max() <= tol:
+      break
+  return X, (a, b), it
@@ -0,0 +1,66 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_stepsize.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 11:03:52 am
+# @description:
+#  Solver-free stepsizes for the gradient projection methods,
+#  - the maximum feasible stepsize by a ratio test,
+#  - the exact line search, since the objective is quadratic
+#    along a direction:
+#     φ(t) = φ(0) + t⋅<∇F(x), d> + t²⋅q(d)
+
+import numpy as np
+
+from .qap_utils import *
+
+
+def np_st(dp, x, param, **kwargs):
+  """The ratio test for the maximum stepsize, i.e.,
+      max t, s.t. x + t⋅dp ≥ 0
+
+  Args:
+      dp: given computed gradient, or a (K, n, n) stack
+      x: current point, or a (K, n, n) stack
+
+  Returns:
+      float: maximum stepsize, 0 if dp has no decreasing entry,
+        a (K, ) array for the stacks
+  """
+  # the roundoff of a projection is not a decreasing entry,
+  #  a ratio against it is either 0 or absurdly large
+  scale = np.maximum(np.abs(dp).max((-2, -1), keepdims=True), 1)
+  neg = dp < -default_tol(dp.dtype) * scale
+  ratio = np.where(neg, np.maximum(x, 0) / np.where(neg, -dp, 1), np.inf)
+  stp = ratio.min((-2, -1))
+  stp = np.where(np.isinf(stp), 0, stp)
+  return stp if stp.ndim else float(stp)
+
+
+def exact_line_search(nabla: QAPDerivative, x, dp, d0, stp, obj=None):
+  """The exact minimizer of the quadratic φ(t) over [0, stp]
+
+  Args:
+      nabla (QAPDerivative): derivative of the objective
+      x: current point, or a (K, n, n) stack
+      dp: direction
+      d0: gradient at x, i.e., nabla.partial_f(x)
+      stp: maximum stepsize
+      obj: the objective at x, Defaults to nabla.obj(x)
+
+  Returns:
+      stepsize and the objective value at x + t⋅dp
+  """
+  obj = nabla.obj(x) if obj is None else obj
+  b = (d0 * dp).sum((-2, -1))
+  a = nabla.curvature(dp)
+  convex = a > 0
+  t_min = np.clip(-b / np.where(convex, 2 * a, 1), 0, stp)
+  # concave along dp, one of the end points
+  t_end = np.where(b * stp + a * stp * stp < 0, stp, 0)
+  t = np.where(convex, t_min, t_end)
+  if not t.ndim:
+    t = float(t)
+  return t, obj + b * t + a * t * t
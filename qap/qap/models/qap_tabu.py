@@ -0,0 +1,77 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_tabu.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 3:05:12 pm
+# @description:
+#  Robust tabu search (Taillard, 1991), the solver-free baseline,
+#  on the delta matrix of `SwapDelta`.
+
+from .qap_utils import *
+from .qap_local_search import *
+
+logger = logging.getLogger('qap.run.tabu')
+
+
+def robust_tabu_search(param: QAPParam, **kwargs):
+  """robust tabu search on pairwise swaps,
+    - a swap (r, s) is tabu if both units return to
+      locations they left within the tenure, the tenure is redrawn
+      uniformly from [0.9n, 1.1n] every 2⋅1.1n iterations,
+    - aspiration: a tabu swap improving the best is accepted,
+      and a swap not made for `tabu_aspiration` iterations is forced.
+
+  Args:
+      param (QAPParam): QAP params
+      tabu_iterations (int): iteration budget, Defaults to 1000n.
+      tabu_time (float): time budget in seconds, Defaults to 10.
+      seed (int): random seed of the initial permutation and tenures.
+
+  Returns:
+      X_sol: the best permutation matrix
+  """
+  n = param.n
+  max_iter = kwargs.get('tabu_iterations') or 1000 * n
+  max_time = kwargs.get('tabu_time', 10)
+  aspiration = kwargs.get('tabu_aspiration', 5 * n * n)
+  rs = np.random.RandomState(kwargs.get('seed', 1))
+  t_min, t_max = int(0.9 * n), int(np.ceil(1.1 * n))
+
+  sd = SwapDelta(param.A0, param.B0, rs.permutation(n))
+  best_p, best_obj = sd.p.copy(), sd.obj
+  tol = 1e-9 * max(abs(best_obj), 1)
+  upper = np.triu(np.ones((n, n), dtype=bool), 1)
+  rows = np.arange(n)
+  # the iteration until which unit i may not return to location j
+  tabu = -(n * rows[:, None] + rows[None, :]) - 1
+  tenure = rs.randint(t_min, t_max + 1)
+
+  start = time.time()
+  it = 0
+  for it in range(max_iter):
+    if time.time() - start > max_time:
+      break
+    if it % (2 * t_max) == 0:
+      tenure = rs.randint(t_min, t_max + 1)
+    # tabu[r, p_s] and tabu[s, p_r] of the swap (r, s)
+    T = tabu[rows[:, None], sd.p[None, :]]
+    is_tabu = (T >= it) & (T.T >= it)
+    aspired = sd.obj + sd.delta < best_obj - tol
+    forced = upper & (T < it - aspiration) & (T.T < it - aspiration)
+    if forced.any():
+      allowed = forced
+    else:
+      allowed = upper & (~is_tabu | aspired)
+      if not allowed.any():
+        allowed = upper
+    r, s = divmod(np.where(allowed, sd.delta, np.inf).argmin(), n)
+    tabu[r, sd.p[r]] = tabu[s, sd.p[s]] = it + tenure
+    sd.swap(r, s)
+    if sd.obj < best_obj - tol:
+      best_p, best_obj = sd.p.copy(), sd.obj
+
+  logger.info(f"robust tabu search: {it} iterations, "
+              f"{time.time() - start:.2f}s, best: {best_obj}")
+  return perm_matrix(best_p)
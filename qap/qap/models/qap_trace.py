@@ -0,0 +1,151 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: models
+# @file: /qap_trace.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 5:48:30 pm
+# @description:
+#  Per-iteration phase timers and counters of the iterative methods,
+#  recorded into preallocated buffers and dumped as a trace
+#  (.jsonl and .npz) next to the results.
+
+import contextlib
+import json
+import time
+
+import numpy as np
+
+PHASES = ('gradient', 'projection', 'stepsize', 'line_search', 'active_set')
+COUNTERS = ('projections', 'pops')
+
+
+def _float_or_none(v):
+  return None if np.isnan(v) else float(v)
+
+
+class PhaseTracer(object):
+  """the timers and counters keyed by phase, e.g.,
+      with tracer.phase('gradient'):
+        d0 = nabla.partial_f(x)
+    accumulate to the current iteration set by `begin`.
+  """
+
+  def __init__(self, size=1000, phases=PHASES, counters=COUNTERS):
+    self.phases = {p: k for k, p in enumerate(phases)}
+    self.counters = {c: k for k, c in enumerate(counters)}
+    self.durations = np.zeros((size, len(phases)))
+    self.counts = np.zeros((size, len(counters)), dtype=np.int64)
+    self.obj = np.full(size, np.nan)
+    self.grad_norm = np.full(size, np.nan)
+    self.it = 0
+    self.size = 0
+
+  def _reserve(self, i):
+    cap = len(self.obj)
+    if i < cap:
+      return
+    cap = max(2 * cap, i + 1)
+    self.durations = np.resize(self.durations, (cap, len(self.phases)))
+    self.counts = np.resize(self.counts, (cap, len(self.counters)))
+    self.obj = np.resize(self.obj, cap)
+    self.grad_norm = np.resize(self.grad_norm, cap)
+    self.durations[self.size:] = 0
+    self.counts[self.size:] = 0
+    self.obj[self.size:] = np.nan
+    self.grad_norm[self.size:] = np.nan
+
+  def begin(self, i):
+    self._reserve(i)
+    self.it = i
+    self.size = max(self.size, i + 1)
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.durations[self.it, self.phases[name]] += time.perf_counter() - start
+
+  def count(self, name, k=1):
+    self.counts[self.it, self.counters[name]] += k
+
+  def record(self, obj=None, grad_norm=None):
+    if obj is not None:
+      self.obj[self.it] = obj
+    if grad_norm is not None:
+      self.grad_norm[self.it] = grad_norm
+
+  def state(self):
+    """the buffers as arrays, e.g., for checkpoints"""
+    n = self.size
+    return {
+        'trace_durations': self.durations[:n],
+        'trace_counts': self.counts[:n],
+        'trace_obj': self.obj[:n],
+        'trace_grad_norm': self.grad_norm[:n]
+    }
+
+  def load_state(self, state):
+    if 'trace_obj' not in state:
+      return
+    n = len(state['trace_obj'])
+    self.begin(max(n - 1, 0))
+    self.size = n
+    self.durations[:n] = state['trace_durations']
+    self.counts[:n] = state['trace_counts']
+    self.obj[:n] = state['trace_obj']
+    self.grad_norm[:n] = state['trace_grad_norm']
+
+  def totals(self):
+    """the aggregated totals for the objectives json"""
+    durations = self.durations[:self.size].sum(0)
+    counts = self.counts[:self.size].sum(0)
+    return {
+        'iterations': self.size,
+        'time': {p: float(durations[k]) for p, k in self.phases.items()},
+        'counts': {c: int(counts[k]) for c, k in self.counters.items()}
+    }
+
+  def dump(self, path):
+    """write `path`.npz and `path`.jsonl, one line per iteration"""
+    n = self.size
+    np.savez(
+        f"{path}.npz",
+        phases=np.array(list(self.phases)),
+        counters=np.array(list(self.counters)),
+        durations=self.durations[:n],
+        counts=self.counts[:n],
+        obj=self.obj[:n],
+        grad_norm=self.grad_norm[:n])
+    with open(f"{path}.jsonl", 'w') as f:
+      for i in range(n):
+        row = {
+            'iteration': i,
+            'obj': _float_or_none(self.obj[i]),
+            'grad_norm': _float_or_none(self.grad_norm[i]),
+            **{p: float(self.durations[i, k]) for p, k in self.phases.items()},
+            **{c: int(self.counts[i, k]) for c, k in self.counters.items()}
+        }
+        f.write(json.dumps(row) + '\n')
+
+
+class NullTracer(object):
+  """the do-nothing tracer when tracing is off"""
+  _null = contextlib.nullcontext()
+
+  def begin(self, i):
+    pass
+
+  def phase(self, name):
+    return self._null
+
+  def count(self, name, k=1):
+    pass
+
+  def record(self, obj=None, grad_norm=None):
+    pass
+
+
+NULL_TRACER = NullTracer()
@@ -6,35 +6,177 @@
 # @modified: brentian (chuwzhang@gmail.com>)
 #    Monday, 21st September 2020 5:09:55 pm
 # @description:
+import atexit
+import copy
+import importlib
 import logging
 import os
 import pickle as pk
+import queue
 import sys
 import time
+from logging.handlers import QueueHandler, QueueListener
 from logging.handlers import TimedRotatingFileHandler as TRFH
 
-import mosek.fusion as mf
-from mosek import callbackcode, dinfitem, iinfitem, liinfitem
-
 from ..conf import *
 from ..deserialize_qapdata import *
 from ..qap_georounding import *
 
-expr = mf.Expr
-dom = mf.Domain
-mat = mf.Matrix
+
+class LazyModule(object):
+  """a proxy of a module (or its attribute) imported on first use,
+    so that the solver-free paths neither pay for nor need Mosek
+  """
+
+  def __init__(self, module, attr=None):
+    self._module = module
+    self._attr = attr
+    self._target = None
+
+  def _resolve(self):
+    if self._target is None:
+      target = importlib.import_module(self._module)
+      self._target = getattr(target, self._attr) if self._attr else target
+    return self._target
+
+  def __getattr__(self, name):
+    return getattr(self._resolve(), name)
+
+  def __call__(self, *args, **kwargs):
+    return self._resolve()(*args, **kwargs)
+
+
+mf = LazyModule('mosek.fusion')
+expr = LazyModule('mosek.fusion', 'Expr')
+dom = LazyModule('mosek.fusion', 'Domain')
+mat = LazyModule('mosek.fusion', 'Matrix')
+callbackcode = LazyModule('mosek', 'callbackcode')
+dinfitem = LazyModule('mosek', 'dinfitem')
+iinfitem = LazyModule('mosek', 'iinfitem')
+liinfitem = LazyModule('mosek', 'liinfitem')
 LOG_PATH = 'log'
 FORMAT = '[%(name)s:%(levelname)s] [%(asctime)s] %(message)s'
-logging.basicConfig(format=FORMAT)
-if LOG_PATH is not None:
-  if not os.path.exists(LOG_PATH):
-    os.makedirs(LOG_PATH)
-handler = TRFH(
-    f'{LOG_PATH}/qap.log', when='M', interval=1, backupCount=7, encoding='utf8')
-handler.setFormatter(logging.Formatter(FORMAT))
-log = logging.getLogger()
-log.addHandler(handler)
-log.setLevel(logging.INFO)
+
+# the listener of this process, see `configure_logging`
+_LOGGING = {'pid': None, 'listener': None, 'handler': None}
+
+
+def configure_logging(log_path=LOG_PATH, level=logging.INFO, **kwargs):
+  """attach a queue handler to the root logger, and the
+    console and daily rotated file handlers to a listener thread,
+    so that the solvers never wait for I/O.
+    Nothing is configured on import; calling again is a no-op,
+    except in a forked process, where the listener is restarted.
+
+  Args:
+      log_path (str): directory of `qap.log`, None for console only
+      level: level of the root logger, Defaults to INFO.
+      when (str): rotation interval, Defaults to 'midnight'.
+      backup_count (int): rotated files to keep, Defaults to 7.
+
+  Returns:
+      QueueListener
+  """
+  root = logging.getLogger()
+  if _LOGGING['pid'] == os.getpid():
+    root.setLevel(level)
+    return _LOGGING['listener']
+  if _LOGGING['handler'] is not None:
+    # inherited from the parent, its listener thread is not forked
+    root.removeHandler(_LOGGING['handler'])
+
+  formatter = logging.Formatter(FORMAT)
+  handlers = [logging.StreamHandler()]
+  if log_path is not None:
+    os.makedirs(log_path, exist_ok=True)
+    handlers.append(
+        TRFH(
+            f'{log_path}/qap.log',
+            when=kwargs.get('when', 'midnight'),
+            backupCount=kwargs.get('backup_count', 7),
+            encoding='utf8'))
+  for h in handlers:
+    h.setFormatter(formatter)
+
+  q = queue.SimpleQueue()
+  listener = QueueListener(q, *handlers, respect_handler_level=True)
+  listener.start()
+  atexit.register(stop_logging)
+  handler = QueueHandler(q)
+  root.addHandler(handler)
+  root.setLevel(level)
+  _LOGGING.update(pid=os.getpid(), listener=listener, handler=handler)
+  return listener
+
+
+def stop_logging():
+  """flush the queue and stop the listener of this process,
+    calling again is a no-op. A worker of `multiprocessing` exits
+    by `os._exit` and skips `atexit`, so it must call this itself.
+  """
+  if _LOGGING['pid'] != os.getpid():
+    return
+  logging.getLogger().removeHandler(_LOGGING['handler'])
+  listener = _LOGGING['listener']
+  _LOGGING.update(pid=None, listener=None, handler=None)
+  listener.stop()
+
+
+def scale_matrices(A0, B0, scaling='l1'):
+  if scaling is None:
+    return A0, B0
+  _scl = scaling.lower()
+  if _scl == 'l1':
+    return A0 / A0.max(), B0 / B0.max()
+  return A0, B0
+
+
+def default_tol(dtype, tol=1e-12):
+  """`tol` but no tighter than the roundoff of `dtype`"""
+  return max(tol, 10 * np.finfo(dtype).eps)
+
+
+def is_sparse(M):
+  """`scipy.sparse.issparse` without importing scipy.sparse,
+    no sparse matrix exists before it is loaded, so the dense
+    runs never pay for the import.
+  """
+  sp = sys.modules.get('scipy.sparse')
+  return sp is not None and sp.issparse(M)
+
+
+def to_sparse(M, density=0.1):
+  """M in CSR if its density is no more than `density`"""
+  if is_sparse(M) or np.count_nonzero(M) > density * M.size:
+    return M
+  import scipy.sparse as sp
+  return sp.csr_matrix(M)
+
+
+def to_dense(M):
+  return M.toarray() if is_sparse(M) else np.asarray(M)
+
+
+def is_symmetric(M):
+  if is_sparse(M):
+    return (M != M.T).nnz == 0
+  return np.array_equal(M, M.T)
+
+
+def lmul(A, X):
+  """A @ X, X may be a (K, n, n) stack if A is sparse"""
+  if not is_sparse(A) or X.ndim == 2:
+    return A @ X
+  K, n, m = X.shape
+  AX = A @ X.transpose(1, 0, 2).reshape(n, K * m)
+  return AX.reshape(-1, K, m).transpose(1, 0, 2)
+
+
+def rmul(X, B):
+  """X @ B, X may be a (K, n, n) stack if B is sparse"""
+  if not is_sparse(B) or X.ndim == 2:
+    return X @ B
+  return (X.reshape(-1, X.shape[-1]) @ B).reshape(*X.shape[:-1], -1)
 
 
 class QAPParam(object):
@@ -48,39 +190,85 @@ class QAPParam(object):
       scaling='l1',
       **kwargs):
     self.A0, self.B0 = A0, B0
+    self.scaling = scaling
     n, m = A0.shape
     self.n = n
     self.m = m
     self.best_obj = obj
-    self.xo = np.zeros((n, n))
+    # the known solution may be missing
+    self.xo = None if arr is None else np.zeros((n, n))
 
-    for idx, v in enumerate(arr):
+    for idx, v in enumerate(arr if arr is not None else []):
       self.xo[idx, v - 1] = 1
 
     e = np.ones(shape=n)
-    E = np.ones(shape=(n, n))
 
-    # scale the input matrix
-    if scaling is None:
-      A, B = A0, B0
-    else:
-      _scl = scaling.lower()
-      if _scl == 'l1':
-        A = A0 / A0.max()
-        B = B0 / B0.max()
-      else:
-        A, B = A0, B0
-
-    # ===
-    # IT IS COSTLY TO COMPUTE THIS
-    # ===
-    # ab = np.kron(B.T, A.T)
-    ab = np.zeros((n, n))
-    self.A = A
-    self.B = B
+    # scale the input matrix, unless given
+    scaled = kwargs.get('scaled')
+    A, B = scale_matrices(A0, B0, scaling) if scaled is None else scaled
+
+    # keep the sparse ones in CSR
+    if kwargs.get('sparse', True):
+      density = kwargs.get('sparse_density', 0.1)
+      self.A0, self.B0 = to_sparse(A0, density), to_sparse(B0, density)
+      A, B = to_sparse(A, density), to_sparse(B, density)
+    # the precision of the relaxations, the original A0, B0 are
+    #  kept as they are for the objective values
+    self.dtype = np.dtype(kwargs.get('precision', 'float64'))
+    self.A = A.astype(self.dtype, copy=False)
+    self.B = B.astype(self.dtype, copy=False)
     self.e = e
-    self.E = E
-    self.ab = ab
+
+  def astype(self, dtype):
+    """a shallow copy with the scaled A, B in `dtype`,
+      rescaled from A0, B0 so that nothing is lost going up
+    """
+    dtype = np.dtype(dtype)
+    if dtype == self.dtype:
+      return self
+    param = copy.copy(self)
+    A, B = scale_matrices(self.A0, self.B0, self.scaling)
+    param.A, param.B = A.astype(dtype), B.astype(dtype)
+    param.dtype = dtype
+    return param
+
+  # ===
+  # the dense helpers are not used by the models,
+  #  allocated only on request
+  # ===
+  @property
+  def E(self):
+    return np.ones(shape=(self.n, self.n))
+
+  @property
+  def ab(self):
+    # IT IS COSTLY TO COMPUTE np.kron(B.T, A.T)
+    return np.zeros((self.n, self.n))
+
+  @property
+  def sparse(self):
+    return is_sparse(self.A) or is_sparse(self.B)
+
+
+def load_param(instance_name, **kwargs):
+  """QAPParam of a QAPLIB instance with its known solution if any,
+    both the parsed and the scaled matrices are cached
+    next to each other under QAP_CACHE.
+  """
+  path = f'{QAP_INSTANCE}/{instance_name}.dat'
+  A0, B0 = parse(path)
+  path_sol = f'{QAP_SOL}/{instance_name}.sln'
+  best_obj, arr = None, None
+  if os.path.exists(path_sol):
+    _, best_obj, arr = parse_sol(path_sol)
+
+  scaling = kwargs.get('scaling', 'l1')
+  suffix = f".{str(scaling).lower()}"
+  AB = load_cache(path, suffix)
+  if AB is None:
+    AB = np.stack(scale_matrices(A0, B0, scaling))
+    save_cache(path, AB, suffix)
+  return QAPParam(A0, B0, best_obj, arr, **{**kwargs, 'scaled': tuple(AB)})
 
 
 class QAPDerivative(object):
@@ -89,8 +277,25 @@ class QAPDerivative(object):
     if param is None:
       self.A, self.B, self.n, self.m, self.e, self.E, self.ab = args
     else:
-      self.A, self.B, self.n, self.m, self.e, self.E, self.ab \
-        = param.A, param.B, param.n, param.m, param.e, param.E, param.ab
+      self.A, self.B, self.n, self.m, self.e \
+        = param.A, param.B, param.n, param.m, param.e
+    self.dtype = self.A.dtype
+    # A^TXB = AXB^T if both are symmetric
+    self.symmetric = is_symmetric(self.A) and is_symmetric(self.B)
+    # transposes in CSR, the products take O(nnz⋅n) if sparse
+    self.At = self.A.T.tocsr() if is_sparse(self.A) else self.A.T
+    self.Bt = self.B.T.tocsr() if is_sparse(self.B) else self.B.T
+
+  def products(self, X):
+    """the products A^TXB and AXB^T
+
+    Args:
+        X: the matrix, or a (K, n, n) stack of matrices
+    """
+    AtXB = rmul(lmul(self.At, X), self.B)
+    if self.symmetric:
+      return AtXB, AtXB
+    return AtXB, rmul(lmul(self.A, X), self.Bt)
 
   def partial_f(self, X):
     """derivative of QAP objective
@@ -98,10 +303,66 @@ class QAPDerivative(object):
     Args:
         X ([type]): [description]
     """
-    return self.A.T.dot(X).dot(self.B) + self.A.dot(X).dot(self.B.T)
+    AtXB, AXBt = self.products(X)
+    return AtXB + AXBt
 
   def obj(self, X):
-    return self.A.T.dot(X).dot(self.B).dot(X.T).trace()
+    AtXB, _ = self.products(X)
+    return (AtXB * X).sum((-2, -1))
+
+  def curvature(self, D):
+    """the second order coefficient of the objective along D,
+      i.e., tr(A^TDBD^T)
+    """
+    AtDB, _ = self.products(D)
+    return (AtDB * D).sum((-2, -1))
+
+  def move(self, X, D, t):
+    """the next iterate X + tD"""
+    return X + t * D
+
+
+class QAPDerivativeCache(QAPDerivative):
+  """The derivative that memoizes the products of
+    the current iterate X and the current direction D,
+    then moving along D updates them linearly,
+      A^T(X + tD)B = A^TXB + tA^TDB
+    without any matmul.
+  The memo is keyed by the identity of the arrays,
+    they should not be modified inplace.
+  """
+
+  def __init__(self, param: QAPParam = None, *args, refresh_interval=50):
+    super().__init__(param, *args)
+    # recompute the products periodically against roundoff drifts
+    self.refresh_interval = refresh_interval
+    self._moves = 0
+    self._memo = []
+
+  def _lookup(self, X):
+    for Y, prod in self._memo:
+      if Y is X:
+        return prod
+    return None
+
+  def products(self, X):
+    prod = self._lookup(X)
+    if prod is None:
+      prod = super().products(X)
+      # keep the iterate and the direction only
+      self._memo = [*self._memo[-1:], (X, prod)]
+    return prod
+
+  def move(self, X, D, t):
+    X_new = X + t * D
+    px, pd = self._lookup(X), self._lookup(D)
+    self._moves += 1
+    if px is None or pd is None or self._moves % self.refresh_interval == 0:
+      return X_new
+    AtXB = px[0] + t * pd[0]
+    prod = (AtXB, AtXB) if self.symmetric else (AtXB, px[1] + t * pd[1])
+    self._memo = [(D, pd), (X_new, prod)]
+    return X_new
 
 
 class QAPTest(object):
@@ -113,15 +374,48 @@ class QAPTest(object):
     self.kwargs = kwargs
     self.start, self.end = None, None
 
+    self.stages = []
+
+  def attach(self, stage):
+    """attach a stage to improve the solution,
+      called as `stage(sol)` after the model
+    """
+    self.stages.append(stage)
+    return self
+
   def run(self):
     self.start = time.time()
     sol = self.model(*self.args, **self.kwargs)
+    for stage in self.stages:
+      sol = stage(sol)
     self.end = time.time()
     return sol
 
 
+def to_perm(x):
+  """the permutation p closest to x, i.e., max <x, X>,
+    X_{i, p_i} = 1, by a linear assignment
+  """
+  from scipy.optimize import linear_sum_assignment
+  _, p = linear_sum_assignment(x, maximize=True)
+  return p
+
+
+def perm_matrix(p):
+  return np.eye(len(p))[p]
+
+
+def is_perm_matrix(x):
+  return ((x == 0) | (x == 1)).all() and (x.sum(0) == 1).all() \
+    and (x.sum(1) == 1).all()
+
+
 def check_obj_val(param, x_sol):
-  _obj = param.A0.T.dot(x_sol).dot(param.B0).dot(x_sol.T).trace()
+  """the original objective, always in float64"""
+  x_sol = np.asarray(x_sol, dtype=np.float64)
+  if is_perm_matrix(x_sol):
+    return perm_obj(param.A0, param.B0, x_sol.argmax(1))
+  _obj = ((param.A0.T @ x_sol @ param.B0) * x_sol).sum()
   return _obj
 
 
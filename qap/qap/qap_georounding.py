@@ -10,6 +10,8 @@
 # geometric rounding
 # ===
 
+import sys
+
 import numpy as np
 
 
@@ -33,29 +35,83 @@ def geo_round(x, u, domain=None):
   return x_int, x_selected
 
 
-def extract_sol_rounding(x, A, B, max_iterations=1e3):
+def perm_obj(A, B, p):
+  """the objective tr(A'XBX') of permutations, i.e.,
+      Σ_ij A_ij B_{p_i p_j}, with X_{i, p_i} = 1,
+    O(n²) by fancy indexing instead of dense matmuls,
+    O(nnz) if either A or B is sparse.
+
+  Args:
+      A, B: the matrices
+      p: a permutation (n, ) or a stack of them (S, n)
+  """
+  sp = sys.modules.get('scipy.sparse')
+  if sp is not None and sp.issparse(A):
+    # O(nnz) over the entries of A
+    A = A.tocoo()
+    i, j = p[..., A.row], p[..., A.col]
+    Bij = B[i.ravel(), j.ravel()]
+    Bij = np.asarray(Bij).reshape(i.shape)
+    return (A.data * Bij).sum(-1)
+  if sp is not None and sp.issparse(B):
+    return perm_obj(B, A, np.argsort(p, axis=-1))
+  return (A * B[p[..., :, None], p[..., None, :]]).sum((-2, -1))
+
+
+def geo_round_batch(x, U):
+  """geometric rounding of a batch of samples, each row picks the
+    column with the least u/x among the columns not yet selected,
+    the (almost) integral rows are fixed first.
 
-  def get_sol_and_obj(x, u):
-    x_int, x_selected = geo_round(x, u)
-    return x_int, A.transpose().dot(x_int).dot(B).dot(x_int.transpose()).trace()
+  Args:
+      x: fractional solution, (n, n)
+      U: normalized exponential vectors, (S, n)
+
+  Returns:
+      permutations, (S, n)
+  """
+  S, n = U.shape
+  rows = np.arange(S)
+  fixed = np.abs(x.max(1) - 1) < 1e-3
+  with np.errstate(divide='ignore'):
+    order = np.argsort(U[:, None, :] / np.maximum(x, 0), axis=2)
+  p = np.empty((S, n), dtype=int)
+  taken = np.zeros((S, n), dtype=bool)
+  p[:, fixed] = x[fixed].argmax(1)
+  taken[:, p[0, fixed]] = True
+  for i in np.flatnonzero(~fixed):
+    cand = order[:, i, :]
+    j = cand[rows, (~taken[rows[:, None], cand]).argmax(1)]
+    p[:, i] = j
+    taken[rows, j] = True
+  return p
+
+
+def extract_sol_rounding(x, A, B, max_iterations=1e3, batch_size=None):
+  n = x.shape[1]
+  # keep the (S, n, n) work arrays around 4M entries
+  batch_size = batch_size or max(1, (1 << 22) // (n * n))
 
   rs = np.random.mtrand.RandomState()
   rs.seed(1)
 
-  def sampling():
-    for i in range(int(max_iterations)):
-      a = rs.exponential(1, size=x.shape[1])
-      u = a / a.sum()
-      yield get_sol_and_obj(x, u)
-
-  x_val_array = np.array(list(sampling()))
+  best_p, best_obj = None, np.inf
+  obj_min, obj_max, obj_sum = np.inf, -np.inf, 0
+  total = int(max_iterations)
+  for start in range(0, total, batch_size):
+    a = rs.exponential(1, size=(min(batch_size, total - start), n))
+    U = a / a.sum(1, keepdims=True)
+    p = geo_round_batch(x, U)
+    objs = perm_obj(A, B, p)
+    idx = objs.argmin()
+    if objs[idx] < best_obj:
+      best_p, best_obj = p[idx], objs[idx]
+    obj_min = min(obj_min, objs.min())
+    obj_max = max(obj_max, objs.max())
+    obj_sum += objs.sum()
 
   # print out sampling status
-  x, _ = min(x_val_array, key=lambda x: x[-1])
-  obj_vals = x_val_array[:, -1]
-  #
   print(
-      f"sampling results: min:{obj_vals.min()}, max:{obj_vals.max()}, avg:{obj_vals.mean()}"
-  )
+      f"sampling results: min:{obj_min}, max:{obj_max}, avg:{obj_sum / total}")
 
-  return x, _
+  return np.eye(n, dtype=int)[best_p], best_obj
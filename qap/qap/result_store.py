@@ -0,0 +1,186 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: qap
+# @file: /result_store.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 6:40:05 pm
+# @description:
+#  An append-only SQLite store of the experiments, one row per
+#  (instance, test, parameter hash, run); the runs of an instance
+#  are committed in one transaction, so a killed worker leaves
+#  nothing behind. Permutations are kept as int32 arrays.
+
+import hashlib
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  run TEXT NOT NULL,
+  instance TEXT NOT NULL,
+  test TEXT NOT NULL,
+  params_hash TEXT NOT NULL,
+  created REAL NOT NULL,
+  value REAL,
+  rel_gap REAL,
+  lb_gap REAL,
+  trace_res REAL,
+  runtime REAL,
+  extra TEXT,
+  kind TEXT,
+  solution BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_instance
+  ON runs (instance, params_hash);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test, created);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+CREATE TABLE IF NOT EXISTS params (
+  params_hash TEXT PRIMARY KEY,
+  params TEXT NOT NULL
+);
+"""
+
+COLUMNS = ('value', 'rel_gap', 'lb_gap', 'trace_res', 'runtime')
+
+
+def params_hash(params):
+  return hashlib.sha1(json.dumps(params,
+                                 sort_keys=True).encode()).hexdigest()[:16]
+
+
+def encode_solution(x):
+  """the kind and bytes of a solution, a permutation matrix
+    is kept as its int32 permutation, otherwise float32
+  """
+  if x is None:
+    return None, None
+  x = np.asarray(x)
+  if ((x == 0) | (x == 1)).all() and (x.sum(0) == 1).all() \
+      and (x.sum(1) == 1).all():
+    return 'perm', x.argmax(1).astype(np.int32).tobytes()
+  return 'dense', x.astype(np.float32).tobytes()
+
+
+def decode_solution(kind, blob):
+  if kind == 'perm':
+    return np.frombuffer(blob, dtype=np.int32)
+  if kind == 'dense':
+    x = np.frombuffer(blob, dtype=np.float32)
+    n = int(np.sqrt(x.size))
+    return x.reshape(n, n)
+  return None
+
+
+class ResultStore(object):
+  """the results of all runs in one SQLite file,
+    safe to be shared by the worker processes.
+  """
+
+  def __init__(self, path, timeout=60):
+    self.path = path
+    self.conn = sqlite3.connect(path, timeout=timeout)
+    self.conn.row_factory = sqlite3.Row
+    # concurrent readers while a worker writes
+    self.conn.execute('PRAGMA journal_mode=WAL')
+    self.conn.executescript(SCHEMA)
+
+  def close(self):
+    self.conn.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def append(self, instance, params, records, solutions=None):
+    """append the records {test: dict} of one run atomically
+
+    Args:
+        instance (str): instance name
+        params (dict): parameters of the run
+        records (dict): test name -> record, the keys in `COLUMNS`
+          become columns and the others are kept as json in `extra`
+        solutions (dict): test name -> solution matrix
+
+    Returns:
+        str: the run id
+    """
+    solutions = solutions or {}
+    h = params_hash(params)
+    created = time.time()
+    run = f"{instance}-{h}-{created:.6f}"
+    rows = []
+    for test, rec in records.items():
+      kind, blob = encode_solution(solutions.get(test))
+      extra = {
+          k: v for k, v in rec.items() if k not in COLUMNS and k != 'instance'
+      }
+      rows.append((run, instance, test, h, created,
+                   *[_float(rec.get(c)) for c in COLUMNS],
+                   json.dumps(extra) if extra else None, kind, blob))
+    with self.conn:
+      self.conn.execute(
+          'INSERT OR IGNORE INTO params VALUES (?, ?)',
+          (h, json.dumps(params, sort_keys=True)))
+      self.conn.executemany(
+          'INSERT INTO runs (run, instance, test, params_hash, created, '
+          f'{", ".join(COLUMNS)}, extra, kind, solution) '
+          f'VALUES ({", ".join("?" * (8 + len(COLUMNS)))})', rows)
+    return run
+
+  def is_finished(self, instance, params):
+    """the instance has a run with the same parameters"""
+    cur = self.conn.execute(
+        'SELECT 1 FROM runs WHERE instance = ? AND params_hash = ? LIMIT 1',
+        (instance, params_hash(params)))
+    return cur.fetchone() is not None
+
+  def query(self,
+            tests=None,
+            instances=None,
+            since=None,
+            until=None,
+            after_id=None,
+            solutions=False):
+    """the records filtered by the tests, instances,
+      creation time in [since, until) (unix time)
+      and the row id, for incremental summaries.
+
+    Returns:
+        list of dict, in the order of row ids
+    """
+    where, args = [], []
+    for col, values in (('test', tests), ('instance', instances)):
+      if values:
+        where.append(f"{col} IN ({', '.join('?' * len(values))})")
+        args.extend(values)
+    for cond, value in (('created >= ?', since), ('created < ?', until),
+                        ('id > ?', after_id)):
+      if value is not None:
+        where.append(cond)
+        args.append(value)
+    sql = 'SELECT runs.*, params.params FROM runs ' \
+      'JOIN params USING (params_hash)'
+    if where:
+      sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY id'
+    records = []
+    for row in self.conn.execute(sql, args):
+      rec = dict(row)
+      kind, blob = rec.pop('kind'), rec.pop('solution')
+      if solutions:
+        rec['solution'] = decode_solution(kind, blob)
+      rec.update(json.loads(rec.pop('extra') or '{}'))
+      rec['params'] = json.loads(rec['params'])
+      records.append(rec)
+    return records
+
+
+def _float(v):
+  return None if v is None else float(v)
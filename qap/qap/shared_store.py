@@ -0,0 +1,192 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: qap
+# @file: /shared_store.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 9:12:27 pm
+# @description:
+#  An instance in shared memory, loaded once and attached by the
+#  worker processes without copying; the workers see a read-only
+#  `QAPParamView` in place of their own `QAPParam`.
+#  A CSR matrix is kept as its (data, indices, indptr) arrays.
+
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .models.qap_utils import QAPParam, is_sparse, load_param
+
+# the matrices of QAPParam put into the shared block
+FIELDS = ('A0', 'B0', 'A', 'B', 'xo')
+# the buffers are aligned for the BLAS
+ALIGN = 64
+# the options of QAPParam that change the shared matrices
+INSTANCE_KEYS = ('scaling', 'sparse', 'sparse_density')
+# the blocks attached by this process, kept alive as long as
+#  any array may point into them, see `attach`
+_ATTACHED = {}
+
+
+def instance_params(kwargs):
+  """the instance-level options in `kwargs` with the defaults
+    of QAPParam, a worker may attach only if they match
+  """
+  scaling = kwargs.get('scaling', 'l1')
+  return {
+      'scaling': None if scaling is None else str(scaling).lower(),
+      'sparse': bool(kwargs.get('sparse', True)),
+      'sparse_density': kwargs.get('sparse_density', 0.1)
+  }
+
+
+def _arrays(name, M):
+  if is_sparse(M):
+    M = M.tocsr()
+    return [((name, 'data'), M.data), ((name, 'indices'), M.indices),
+            ((name, 'indptr'), M.indptr)]
+  return [((name, None), np.ascontiguousarray(M))]
+
+
+class SharedInstance(object):
+  """the matrices of a QAPParam in one shared memory block,
+    owned by the process that creates it; `meta` is small and
+    picklable, and is all a worker needs for `attach`.
+  """
+
+  def __init__(self, param: QAPParam, name=None, params=None):
+    layout, offset = [], 0
+    arrays = []
+    for field in FIELDS:
+      M = getattr(param, field)
+      if M is None:
+        continue
+      for key, arr in _arrays(field, M):
+        layout.append((key, offset, arr.shape, arr.dtype.str))
+        arrays.append(arr)
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    self.shm = shared_memory.SharedMemory(
+        name=name, create=True, size=max(offset, 1))
+    for (key, start, shape, dtype), arr in zip(layout, arrays):
+      buf = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)
+      buf[...] = arr
+    self.meta = {
+        'name': self.shm.name,
+        'layout': layout,
+        'shapes': {f: getattr(param, f).shape for f in ('A0', 'B0', 'A', 'B')},
+        'n': param.n,
+        'm': param.m,
+        'best_obj': param.best_obj,
+        'scaling': param.scaling,
+        'params': instance_params(params or {}),
+    }
+
+  @classmethod
+  def from_instance(cls, instance_name, **kwargs):
+    """load a QAPLIB instance straight into shared memory"""
+    return cls(load_param(instance_name, **kwargs), params=kwargs)
+
+  @property
+  def nbytes(self):
+    return self.shm.size
+
+  def close(self):
+    """release and remove the block, the attached views
+      stay valid until they are closed
+    """
+    self.shm.close()
+    self.shm.unlink()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+class QAPParamView(object):
+  """a read-only QAPParam over a shared block,
+    the matrices are views of the block and nothing is copied.
+  """
+  __slots__ = ('A0', 'B0', 'A', 'B', 'xo', 'n', 'm', 'e', 'best_obj',
+               'scaling', 'dtype', '_params', '_shm')
+
+  def __init__(self, meta, shm):
+    object.__setattr__(self, '_shm', shm)
+    object.__setattr__(self, '_params', meta['params'])
+    parts = {}
+    for (field, part), start, shape, dtype in meta['layout']:
+      arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+      arr.flags.writeable = False
+      parts.setdefault(field, {})[part] = arr
+    for field in FIELDS:
+      p = parts.get(field)
+      if p is None:
+        M = None
+      elif None in p:
+        M = p[None]
+      else:
+        import scipy.sparse as sp
+        M = sp.csr_matrix((p['data'], p['indices'], p['indptr']),
+                          shape=meta['shapes'][field],
+                          copy=False)
+      object.__setattr__(self, field, M)
+    for k in ('n', 'm', 'best_obj', 'scaling'):
+      object.__setattr__(self, k, meta[k])
+    object.__setattr__(self, 'e', np.ones(meta['n']))
+    object.__setattr__(self, 'dtype', self.A.dtype)
+
+  def __setattr__(self, name, value):
+    raise AttributeError(f"QAPParamView is read-only, cannot set {name}")
+
+  # the same lazy helpers as QAPParam
+  E = QAPParam.E
+  ab = QAPParam.ab
+  sparse = QAPParam.sparse
+
+  def astype(self, dtype):
+    """self if `dtype` is the shared one, otherwise
+      a private QAPParam in `dtype`
+    """
+    if np.dtype(dtype) == self.dtype:
+      return self
+    param = QAPParam(
+        self.A0,
+        self.B0,
+        self.best_obj,
+        None,
+        self.scaling,
+        precision=dtype,
+        sparse=self._params['sparse'],
+        sparse_density=self._params['sparse_density'])
+    param.xo = self.xo
+    return param
+
+  def close(self):
+    """detach the block, no array of it may be used afterwards"""
+    _ATTACHED.pop(self._shm.name, None)
+    self._shm.close()
+
+
+def compatible(meta, kwargs):
+  """the shared matrices are those QAPParam would build from `kwargs`"""
+  return meta['params'] == instance_params(kwargs)
+
+
+def attach(meta):
+  """the QAPParamView of a SharedInstance from its `meta`,
+    the block is mapped once per process and stays mapped
+    until the view is closed, since the arrays taken from the
+    view (e.g., by `astype`) would dangle otherwise.
+  """
+  shm = _ATTACHED.get(meta['name'])
+  if shm is None:
+    if sys.version_info >= (3, 13):
+      shm = shared_memory.SharedMemory(name=meta['name'], track=False)
+    else:
+      # the workers of `multiprocessing` share the resource tracker
+      #  of the creator, registering again is a no-op there
+      shm = shared_memory.SharedMemory(name=meta['name'])
+    _ATTACHED[shm.name] = shm
+  return QAPParamView(meta, shm)
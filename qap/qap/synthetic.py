@@ -0,0 +1,72 @@
+# @license: %MIT License%:~ http://www.opensource.org/licenses/MIT
+# @project: qap
+# @file: /synthetic.py
+# @created: Sunday, 18th October 2026
+# @author: brentian (chuwzhang@gmail.com)
+# @modified: brentian (chuwzhang@gmail.com>)
+#    Sunday, 18th October 2026 7:31:12 pm
+# @description:
+#  Synthetic QAP instances of any size with fixed seeds,
+#  - tai: uniform symmetric flows and distances (Taillard, taiXXa),
+#  - grid: Manhattan distances of a grid and sparse integral flows
+#      (Nugent, nugXX),
+#  - esc: Hamming distances of binary codes and very sparse 0/1
+#      flows (Eschermann & Wunderlich, escXX).
+
+import numpy as np
+
+from .models.qap_utils import QAPParam
+
+
+def _symmetric(M):
+  M = np.triu(M, 1)
+  return M + M.T
+
+
+def taillard_uniform(n, seed=1, low=0, high=99):
+  rs = np.random.RandomState(seed)
+  A = _symmetric(rs.randint(low, high + 1, size=(n, n)))
+  B = _symmetric(rs.randint(low, high + 1, size=(n, n)))
+  return A.astype(np.float64), B.astype(np.float64)
+
+
+def grid_flow(n, seed=1, density=0.5, high=9):
+  rs = np.random.RandomState(seed)
+  cols = int(np.ceil(np.sqrt(n)))
+  loc = np.stack(divmod(np.arange(n), cols), axis=1)
+  B = np.abs(loc[:, None, :] - loc[None, :, :]).sum(-1)
+  mask = rs.random_sample((n, n)) < density
+  A = _symmetric(rs.randint(1, high + 1, size=(n, n)) * mask)
+  return A.astype(np.float64), B.astype(np.float64)
+
+
+def esc_like(n, seed=1, density=None):
+  rs = np.random.RandomState(seed)
+  # a few flows per unit, as sparse as the esc family
+  density = density or min(1, 4 / n)
+  A = _symmetric(rs.random_sample((n, n)) < density)
+  bits = max(1, int(np.ceil(np.log2(n))))
+  codes = rs.permutation(1 << bits)[:n]
+  xor = codes[:, None] ^ codes[None, :]
+  B = np.zeros((n, n), dtype=np.int64)
+  for k in range(bits):
+    B += (xor >> k) & 1
+  return A.astype(np.float64), B.astype(np.float64)
+
+
+GENERATORS = {
+    'tai': taillard_uniform,
+    'grid': grid_flow,
+    'esc': esc_like,
+}
+
+
+def make_instance(kind, n, seed=1, **kwargs):
+  """the flow and distance matrices (A0, B0) of a `kind` instance"""
+  return GENERATORS[kind](n, seed=seed, **kwargs)
+
+
+def make_param(kind, n, seed=1, **kwargs):
+  """QAPParam of a synthetic instance, no known solution"""
+  A0, B0 = make_instance(kind, n, seed)
+  return QAPParam(A0, B0, None, None, **kwargs)
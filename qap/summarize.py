@@ -8,19 +8,56 @@
 # @description:
 # summarize the current results and produce a benchmark as of today here.
 
-import pandas as pd
-import json
-import os
+import argparse
 import datetime
+import os
+
+import pandas as pd
+
+from qap.conf import RESULT_DIR, RESULT_DB
+from qap.result_store import ResultStore
+
+# the last summarized row, for --incremental
+STATE = f"{RESULT_DIR}/.summarized"
+
+
+def to_timestamp(date):
+  return None if date is None else datetime.datetime.fromisoformat(
+      date).timestamp()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--tests', nargs='+', default=None)
+parser.add_argument('--since', default=None, help='e.g., 2026-10-18')
+parser.add_argument('--until', default=None)
+parser.add_argument(
+    '--incremental',
+    action='store_true',
+    help='only the runs added since the last incremental summary')
+args = parser.parse_args()
+
+after_id = None
+if args.incremental and os.path.exists(STATE):
+  with open(STATE, 'r') as f:
+    after_id = int(f.read())
+
+with ResultStore(f"{RESULT_DIR}/{RESULT_DB}") as store:
+  data = store.query(
+      tests=args.tests,
+      since=to_timestamp(args.since),
+      until=to_timestamp(args.until),
+      after_id=after_id)
+if args.tests is None:
+  data = [v for v in data if v['test'] not in ('best', 'bounds')]
 
 d = datetime.datetime.now()
 dt_str = d.strftime("%Y%m%d-%H%M")
-smr = [f for f in os.listdir('./result/') if f.endswith("json")]
-data = [
-    v for f in smr for k, v in json.load(open(f"result/{f}")).items()
-    if k != 'best'
-]
 df = pd.DataFrame.from_records(data)
+if not df.empty:
+  df['created'] = pd.to_datetime(df['created'], unit='s')
 
 print(df)
 df.to_csv(f"summary_{dt_str}.csv")
+if args.incremental and data:
+  with open(STATE, 'w') as f:
+    f.write(str(max(v['id'] for v in data)))
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_skips_scipy():
+  # scipy costs more than numpy to import, it is loaded
+  #  only by the code that needs it
+  code = ("import sys, qap.models, qap.main; "
+          "print(sorted(m for m in sys.modules if m.startswith('scipy')))")
+  out = subprocess.run([sys.executable, '-c', code],
+                       cwd=HERE,
+                       capture_output=True,
+                       text=True,
+                       check=True)
+  assert out.stdout.strip() == '[]'
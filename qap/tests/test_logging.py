@@ -0,0 +1,24 @@
+import logging
+import multiprocessing as mp
+
+import qap.main
+
+
+def _noisy_single(instance_name, **kwargs):
+  logger = logging.getLogger('qap.run.test')
+  for k in range(5000):
+    logger.info(f"{instance_name} line {k}")
+  logger.info(f"{instance_name} the last line")
+
+
+def test_worker_log_is_flushed(workdir, monkeypatch):
+  monkeypatch.setattr(qap.main, 'main_single', _noisy_single)
+  p = mp.get_context('fork').Process(
+      target=qap.main._run_instance, args=('nug12', {}))
+  p.start()
+  p.join(60)
+  assert p.exitcode == 0
+  with open(workdir / 'log' / 'qap.log') as f:
+    lines = f.read().splitlines()
+  assert lines[-1].endswith('nug12 the last line')
+  assert len(lines) == 5001
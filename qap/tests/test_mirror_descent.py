@@ -0,0 +1,17 @@
+import logging
+import re
+
+import numpy as np
+
+from qap.models import load_param, sinkhorn_mirror_descent
+
+
+def test_mirror_descent_converges(add_instances, caplog):
+  add_instances('nug12')
+  param = load_param('nug12')
+  with caplog.at_level(logging.INFO, logger='qap.run.mirror_descent'):
+    X = sinkhorn_mirror_descent(param, max_iteration=500, logging_interval=100)
+  final = re.findall(r'iteration@(\d+)', caplog.text)
+  assert int(final[-1]) < 499
+  assert np.array_equal(X.sum(0), np.ones(12))
+  assert np.array_equal(X.sum(1), np.ones(12))
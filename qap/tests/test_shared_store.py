@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from qap.shared_store import SharedInstance, attach
+from qap.synthetic import make_param
+
+
+@pytest.mark.parametrize('kwargs', [{
+    'sparse': True
+}, {
+    'sparse': True,
+    'sparse_density': 0.3
+}, {
+    'sparse': False
+}])
+def test_astype_keeps_sparse(kwargs):
+  param = make_param('esc', 64, **kwargs)
+  with SharedInstance(param, params=kwargs) as shared:
+    view = attach(shared.meta)
+    single = view.astype(np.float32)
+    assert single.dtype == np.float32
+    assert single.sparse == param.sparse == kwargs['sparse']
+    view.close()
@@ -1,29 +1,62 @@
+import importlib
 import logging
 
-# solver sanity check
-BOOL_HAS_COPT = True
-BOOL_HAS_GRB = True
-
 logger = logging.getLogger("sfhub.util")
-try:
-    import coptpy
-except ImportError as e:
-    logger.warning("Cannot find COPT & coptpy")
-    # logger.exception(e)
-    BOOL_HAS_COPT = False
-try:
-    import gurobipy
-except ImportError as e:
-    logger.warning("Cannot find GUROBI & gurobipy")
-    BOOL_HAS_GRB = False
-
-try:
-    import mosek.fusion as mf
-    expr = mf.Expr
-    dom = mf.Domain
-    mat = mf.Matrix
-except ImportError as e:
-    logger.warning('no mosek detected')
+
+# solver backends, imported on first use
+BACKENDS = {
+    'COPT': 'coptpy',
+    'GUROBI': 'gurobipy',
+    'MOSEK': 'mosek.fusion',
+}
+_LOADED = {}
+
+
+def backend(name):
+    """
+    the module of solver `name`, imported on first use;
+    None if it is missing, the check is cached and warned once
+    """
+    key = name.upper()
+    if key not in _LOADED:
+        try:
+            _LOADED[key] = importlib.import_module(BACKENDS[key])
+        except ImportError:
+            logger.warning(f"Cannot find {key} & {BACKENDS[key]}")
+            _LOADED[key] = None
+    return _LOADED[key]
+
+
+def has_backend(name):
+    return backend(name) is not None
+
+
+# the module attributes of the eager version, resolved lazily (PEP 562)
+_LAZY = {
+    'coptpy': lambda: backend('COPT'),
+    'gurobipy': lambda: backend('GUROBI'),
+    'mf': lambda: backend('MOSEK'),
+    'expr': lambda: backend('MOSEK').Expr,
+    'dom': lambda: backend('MOSEK').Domain,
+    'mat': lambda: backend('MOSEK').Matrix,
+    'BOOL_HAS_COPT': lambda: has_backend('COPT'),
+    'BOOL_HAS_GRB': lambda: has_backend('GUROBI'),
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _model_backend(model):
+    """the backend name of a solver model, by its module only"""
+    module = type(model).__module__.split('.')[0]
+    for key, mod in BACKENDS.items():
+        if mod.split('.')[0] == module:
+            return key
+    return None
 
 
 class ModelWrapper(object):
@@ -37,36 +70,36 @@ class ModelWrapper(object):
             self.model = model
         else:
             if _solver_name == 'COPT':
-                if BOOL_HAS_COPT:
-                    envr = coptpy.Envr()
+                if has_backend('COPT'):
+                    envr = backend('COPT').Envr()
                     self.model = envr.createModel(name=name)
                 else:
                     raise ValueError("Cannot find COPT!")
             elif _solver_name == 'GUROBI':
-                if BOOL_HAS_GRB:
-                    self.model = gurobipy.Model(name)
+                if has_backend('GUROBI'):
+                    self.model = backend('GUROBI').Model(name)
                 else:
                     logger.warning('Cannot find GUROBI, pls install the API properly')
             else:
                 logger.info('Unknown solver, fallback to COPT')
                 try:
-                    envr = coptpy.Envr()
+                    envr = backend('COPT').Envr()
                     self.model = envr.createModel(name=name)
                 except Exception as e:
                     logger.error("Cannot find COPT!")
                     raise e
         self.obj_map = object_map
         self._objective_value = None
-        self.is_copt, self.is_grb = False, False
-        if BOOL_HAS_COPT:
-            self.is_copt = self.model.__class__ == coptpy.Model
-        if BOOL_HAS_GRB:
-            self.is_grb = self.model.__class__ == gurobipy.Model
+        # only the backend of the model is imported
+        _backend = _model_backend(self.model)
+        self.is_copt, self.is_grb = _backend == 'COPT', _backend == 'GUROBI'
 
         if not (self.is_grb or self.is_copt):
             raise ValueError("unsupported, neither COPT nor GUROBI")
 
         # wrapper constants
+        coptpy = backend('COPT') if self.is_copt else None
+        gurobipy = backend('GUROBI') if self.is_grb else None
         if self.is_copt:
             self.INTEGER = coptpy.COPT.INTEGER
             self.BINARY = coptpy.COPT.BINARY
@@ -112,9 +145,9 @@ class ModelWrapper(object):
         :return:
         """
         if self.is_copt:
-            return self.model.status != coptpy.COPT.INFEASIBLE
+            return self.model.status != backend('COPT').COPT.INFEASIBLE
         if self.is_grb:
-            return self.model.status != gurobipy.GRB.INFEASIBLE
+            return self.model.status != backend('GUROBI').GRB.INFEASIBLE
         return False
 
     def set_properties(self, **kwargs):